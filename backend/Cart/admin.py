@@ -1,9 +1,12 @@
 from django.contrib import admin
-from .models import CartModel, AddCardModel
+from .models import CartModel, AddCardModel, OrderModel, OrderLineModel
 
 @admin.register(CartModel)
 class CartAdmin(admin.ModelAdmin):
-    list_display = ['user', 'product', 'quantity', 'status', 'total_price']
+    list_display = [
+        'user', 'product', 'quantity', 'status', 'total_price', 'updated_at'
+    ]
+    list_select_related = ['user', 'product']
     list_filter = ['status', 'user']
     search_fields = ['user__username', 'product__title']
 
@@ -11,3 +14,16 @@ class CartAdmin(admin.ModelAdmin):
 class CardAdmin(admin.ModelAdmin):
     list_display = ['user', 'card_name', 'card_number', 'expiry_date', 'added_at']
     search_fields = ['user__username', 'card_name', 'card_number']
+
+
+class OrderLineInline(admin.TabularInline):
+    model = OrderLineModel
+    extra = 0
+    readonly_fields = ['product', 'title', 'price', 'quantity']
+
+
+@admin.register(OrderModel)
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'total_price', 'created_at']
+    list_select_related = ['user']
+    inlines = [OrderLineInline]
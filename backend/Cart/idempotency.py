@@ -0,0 +1,107 @@
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKeyModel
+
+
+HEADER = "Idempotency-Key"
+TTL = getattr(settings, "IDEMPOTENCY_KEY_TTL", timedelta(hours=24))
+LEASE = getattr(settings, "IDEMPOTENCY_KEY_LEASE", timedelta(minutes=2))
+
+
+def request_fingerprint(request):
+    payload = json.dumps(request.data, sort_keys=True, default=str)
+    source = f"{request.method} {request.path}\n{payload}"
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def replay(record):
+    data = json.loads(record.body) if record.body else None
+    response = Response(data, status=record.status_code)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(handler):
+    """
+    Makes a view handler replay its first response when the client retries
+    with the same ``Idempotency-Key``. The key row is inserted before the
+    handler runs, so a concurrent duplicate is stopped by the unique
+    constraint instead of a lock and gets 409 until the first one finishes,
+    or until ``LEASE`` runs out if its worker died mid-request. Failed (5xx
+    or raising) requests release the key so they can be retried.
+    """
+
+    @functools.wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return handler(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response(
+                {"error": f"{HEADER} must be at most 255 characters"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        fingerprint = request_fingerprint(request)
+        try:
+            with transaction.atomic():
+                record = IdempotencyKeyModel.objects.create(
+                    user=request.user, key=key, fingerprint=fingerprint
+                )
+        except IntegrityError:
+            record = IdempotencyKeyModel.objects.filter(
+                user=request.user, key=key
+            ).first()
+            now = timezone.now()
+            expired = record is not None and (
+                record.created_at < now - TTL
+                or (record.status_code is None and record.created_at < now - LEASE)
+            )
+            if record is None or expired:
+                # Expired, abandoned or purged meanwhile: treat the key as
+                # unused. Only this exact row is dropped, so a retry that
+                # claimed the key first is left alone.
+                if record is not None:
+                    IdempotencyKeyModel.objects.filter(pk=record.pk).delete()
+                return wrapper(self, request, *args, **kwargs)
+            if record.fingerprint != fingerprint:
+                return Response(
+                    {"error": f"{HEADER} was already used for a different request"},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            if record.status_code is None:
+                return Response(
+                    {"error": f"A request with this {HEADER} is still in progress"},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            return replay(record)
+
+        try:
+            response = handler(self, request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+        if response.status_code >= 500:
+            record.delete()
+            return response
+
+        record.status_code = response.status_code
+        record.body = (
+            json.dumps(response.data, cls=JSONEncoder)
+            if response.data is not None
+            else ""
+        )
+        record.save(update_fields=["status_code", "body"])
+        return response
+
+    return wrapper
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from Cart.models import CartModel, OrderLineModel, OrderModel
+
+
+class Command(BaseCommand):
+    help = (
+        "Move legacy cart rows with status Sold into orders, one order per user, "
+        "and delete them from the cart table. Sale-time prices were never stored, "
+        "so the current product price is recorded."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many rows and orders would be archived.",
+        )
+
+    def handle(self, *args, **options):
+        sold = CartModel.objects.filter(status="Sold")
+        user_ids = list(sold.values_list("user_id", flat=True).distinct())
+
+        if options["dry_run"]:
+            self.stdout.write(
+                f"Would archive {sold.count()} sold rows into {len(user_ids)} orders"
+            )
+            return
+
+        orders = rows = 0
+        for user_id in user_ids:
+            with transaction.atomic():
+                lines = list(sold.filter(user_id=user_id).with_line_totals())
+                if not lines:
+                    continue
+                order = OrderModel.objects.create(
+                    user_id=user_id,
+                    total_price=sum(line.line_total for line in lines),
+                )
+                OrderLineModel.objects.bulk_create(
+                    [line.to_order_line(order) for line in lines]
+                )
+                CartModel.objects.filter(id__in=[line.id for line in lines]).delete()
+            orders += 1
+            rows += len(lines)
+        self.stdout.write(
+            self.style.SUCCESS(f"Archived {rows} sold rows into {orders} orders")
+        )
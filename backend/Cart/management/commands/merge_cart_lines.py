@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Min, Sum
+
+from Cart.models import CartModel
+
+
+class Command(BaseCommand):
+    help = (
+        "Merge duplicate active cart lines into one line per user and product. "
+        "Run before migrating to the unique_active_cart_line constraint."
+    )
+
+    def handle(self, *args, **options):
+        duplicates = (
+            CartModel.objects.filter(status="Active")
+            .values("user_id", "product_id")
+            .annotate(lines=Count("id"), keep_id=Min("id"), total=Sum("quantity"))
+            .filter(lines__gt=1)
+        )
+        merged = removed = 0
+        with transaction.atomic():
+            for row in duplicates:
+                CartModel.objects.filter(id=row["keep_id"]).update(
+                    quantity=row["total"]
+                )
+                removed += CartModel.objects.filter(
+                    user_id=row["user_id"],
+                    product_id=row["product_id"],
+                    status="Active",
+                ).exclude(id=row["keep_id"]).delete()[0]
+                merged += 1
+        self.stdout.write(
+            self.style.SUCCESS(f"Merged {merged} lines, removed {removed} duplicates")
+        )
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from Cart.idempotency import TTL
+from Cart.models import IdempotencyKeyModel
+
+
+class Command(BaseCommand):
+    help = "Delete stored Idempotency-Key responses older than IDEMPOTENCY_KEY_TTL."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        expired = IdempotencyKeyModel.objects.filter(
+            created_at__lt=timezone.now() - TTL
+        ).order_by("id")
+        deleted = 0
+        while True:
+            ids = list(
+                expired.values_list("id", flat=True)[: options["batch_size"]]
+            )
+            if not ids:
+                break
+            deleted += IdempotencyKeyModel.objects.filter(id__in=ids).delete()[0]
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(f"Deleted {deleted} expired keys in {elapsed:.2f}s")
+        )
@@ -0,0 +1,86 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from Cart.models import CartModel
+
+
+STALE_AFTER = getattr(settings, "CART_STALE_AFTER", datetime.timedelta(days=30))
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete active cart lines that were not touched for CART_STALE_AFTER. "
+        "Rows are removed in small primary key ranges, each in its own short "
+        "transaction, so the job can run from cron next to live traffic."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Override CART_STALE_AFTER with a number of days.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.05,
+            help="Seconds to pause between batches so other writers get the lock.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many lines would be deleted.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1")
+        stale_after = STALE_AFTER
+        if options["days"] is not None:
+            stale_after = datetime.timedelta(days=options["days"])
+
+        started = time.monotonic()
+        cutoff = timezone.now() - stale_after
+        stale = CartModel.objects.filter(status="Active", updated_at__lt=cutoff)
+
+        if options["dry_run"]:
+            count = stale.count()
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"Would delete {count} cart lines untouched since "
+                f"{cutoff:%Y-%m-%d %H:%M} ({elapsed:.2f}s)"
+            )
+            return
+
+        deleted = batches = 0
+        last_id = 0
+        while True:
+            ids = list(
+                stale.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            # The stale condition is repeated so a line touched since the
+            # SELECT survives.
+            deleted += stale.filter(id__gte=ids[0], id__lte=ids[-1]).delete()[0]
+            batches += 1
+            last_id = ids[-1]
+            if len(ids) < batch_size:
+                break
+            time.sleep(options["sleep"])
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Deleted {deleted} stale cart lines in {batches} batches "
+                f"in {elapsed:.2f}s"
+            )
+        )
@@ -1,8 +1,100 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    IntegerField,
+    Q,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast, Round
 from Products.models import ProductsModel
 from django.utils import timezone
 
 
+# Summed in integer cents: SQLite multiplies decimals as floats and hands back
+# values like Decimal('39.9600000000000').
+LINE_TOTAL_CENTS = F("quantity") * Cast(
+    Round(F("product__price") * 100), output_field=IntegerField()
+)
+CENT = Decimal("0.01")
+
+
+def cents_to_price(cents):
+    return (Decimal(cents or 0) / 100).quantize(CENT)
+
+
+class CartQuerySet(models.QuerySet):
+    def active(self, user):
+        return self.filter(user=user, status="Active")
+
+    def with_line_totals(self):
+        return self.select_related("product__category").annotate(
+            line_total_cents=LINE_TOTAL_CENTS
+        )
+
+    def summary(self):
+        """Line count, item count and grand total in one aggregate query."""
+        totals = self.aggregate(
+            lines=Count("id"),
+            items=Sum("quantity"),
+            total_cents=Sum(LINE_TOTAL_CENTS),
+        )
+        return {
+            "lines": totals["lines"],
+            "items": totals["items"] or 0,
+            "total_price": cents_to_price(totals["total_cents"]),
+        }
+
+
+class OutOfStock(Exception):
+    def __init__(self, items):
+        super().__init__("Not enough stock")
+        self.items = items
+
+
+def reserve_stock(quantities):
+    """
+    Takes ``{product_id: quantity}`` out of stock with a single conditional
+    ``UPDATE ... SET stock = stock - n WHERE stock >= n``, so concurrent
+    checkouts can never sell more than is on hand. Products that do not
+    track stock always pass. If any product is short or gone nothing is
+    taken and ``OutOfStock`` lists those items.
+    """
+    needed = Case(
+        *[When(id=pid, then=Value(quantity)) for pid, quantity in quantities.items()],
+        output_field=models.PositiveIntegerField(),
+    )
+    products = ProductsModel.objects.filter(id__in=list(quantities))
+    with transaction.atomic():
+        reserved = products.filter(Q(stock__isnull=True) | Q(stock__gte=needed)).update(
+            stock=F("stock") - needed
+        )
+        if reserved == len(quantities):
+            return
+        transaction.set_rollback(True)
+
+    # A product deleted since the cart was read is reported with nothing left.
+    found = {
+        product["id"]: product for product in products.values("id", "title", "stock")
+    }
+    short = []
+    for pid in sorted(quantities):
+        product = found.get(pid, {"title": "", "stock": 0})
+        if product["stock"] is not None and product["stock"] < quantities[pid]:
+            short.append({
+                "product_id": pid,
+                "title": product["title"],
+                "requested": quantities[pid],
+                "available": product["stock"],
+            })
+    raise OutOfStock(short)
+
+
 class CartModel(models.Model):
     CHOICES = (
         ("Active", "active"),
@@ -25,14 +117,71 @@ class CartModel(models.Model):
         choices=CHOICES,
         default="Active"
     )
+    # Last time the line was added to or changed; stale lines get purged.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CartQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status", "updated_at"], name="cart_status_updated_idx"
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "product"],
+                condition=Q(status="Active"),
+                name="unique_active_cart_line",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.product.title} ({self.quantity})"
 
+    @classmethod
+    def add_product(cls, user, product, quantity):
+        """
+        Adds ``quantity`` to the user's active line for ``product``, creating
+        the line if there is none. Returns ``(line, created)``.
+
+        An existing line is bumped with a single ``UPDATE ... SET quantity =
+        quantity + n``; if two requests race to create the same line, the
+        unique constraint rejects the second insert and it falls back to
+        the update.
+        """
+        active = cls.objects.filter(user=user, product=product, status="Active")
+        bump = {"quantity": F("quantity") + quantity, "updated_at": timezone.now()}
+        if not active.update(**bump):
+            try:
+                with transaction.atomic():
+                    line = cls.objects.create(
+                        user=user, product=product, quantity=quantity, status="Active"
+                    )
+                return line, True
+            except IntegrityError:
+                active.update(**bump)
+        return active.with_line_totals().get(), False
+
+    def to_order_line(self, order):
+        return OrderLineModel(
+            order=order,
+            product_id=self.product_id,
+            title=self.product.title,
+            price=self.product.price,
+            quantity=self.quantity,
+        )
+
     @property
-    def total_price(self):
+    def line_total(self):
+        if hasattr(self, "line_total_cents"):
+            return cents_to_price(self.line_total_cents)
         return self.product.price * self.quantity
 
+    @property
+    def total_price(self):
+        return self.line_total
+
 
 class AddCardModel(models.Model):
     user = models.ForeignKey(
@@ -53,3 +202,73 @@ class AddCardModel(models.Model):
 
     def __str__(self):
         return f"{self.card_name} ({self.card_number[-4:]})"
+
+
+class OrderModel(models.Model):
+    user = models.ForeignKey(
+        "User.UserModel",
+        on_delete=models.CASCADE,
+        related_name="orders"
+    )
+    total_price = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Order"
+        verbose_name_plural = "Orders"
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(fields=["user", "-created_at"], name="order_user_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"Order #{self.id} - {self.user.email} ({self.total_price})"
+
+
+class OrderLineModel(models.Model):
+    order = models.ForeignKey(
+        OrderModel,
+        on_delete=models.CASCADE,
+        related_name="lines"
+    )
+    # Title and price are copied at sale time, so later catalog edits or a
+    # deleted product do not rewrite the order history.
+    product = models.ForeignKey(
+        ProductsModel,
+        on_delete=models.SET_NULL,
+        null=True
+    )
+    title = models.CharField(max_length=255, default="")
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.PositiveIntegerField(default=1)
+
+    @property
+    def total_price(self):
+        return self.price * self.quantity
+
+    def __str__(self):
+        return f"{self.title} x{self.quantity}"
+
+
+class IdempotencyKeyModel(models.Model):
+    """
+    First response to a write request sent with an ``Idempotency-Key``
+    header. ``status_code`` stays empty while the request is in flight.
+    """
+    user = models.ForeignKey(
+        "User.UserModel",
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    body = models.TextField(default="")
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="unique_idempotency_key"
+            ),
+        ]
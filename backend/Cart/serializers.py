@@ -1,10 +1,10 @@
 from rest_framework import serializers
-from .models import CartModel, AddCardModel
+from .models import CartModel, AddCardModel, OrderModel, OrderLineModel
 from Products.models import ProductsModel
-from Products.serializers import ProductSerializer
+from Products.serializers import ProductListSerializer
 
 class CartSerializer(serializers.ModelSerializer):
-    product = ProductSerializer(read_only=True)
+    product = ProductListSerializer(read_only=True)
     product_id = serializers.PrimaryKeyRelatedField(
         queryset=ProductsModel.objects.all(),
         source="product",
@@ -17,7 +17,46 @@ class CartSerializer(serializers.ModelSerializer):
         fields = ["id", "product", "product_id", "quantity", "total_price"]
 
     def get_total_price(self, obj):
-        return obj.product.price * obj.quantity
+        return obj.total_price
+
+
+class CartOperationSerializer(serializers.Serializer):
+    OPS = ("add", "set", "remove")
+
+    op = serializers.ChoiceField(choices=OPS)
+    product_id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, attrs):
+        if attrs["op"] == "add" and attrs.get("quantity", 1) < 1:
+            raise serializers.ValidationError(
+                {"quantity": "must be at least 1 for add"}
+            )
+        if attrs["op"] == "set" and "quantity" not in attrs:
+            raise serializers.ValidationError({"quantity": "is required for set"})
+        return attrs
+
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=100)
+
+
+class OrderLineSerializer(serializers.ModelSerializer):
+    total_price = serializers.DecimalField(
+        max_digits=14, decimal_places=2, read_only=True
+    )
+
+    class Meta:
+        model = OrderLineModel
+        fields = ["id", "product_id", "title", "price", "quantity", "total_price"]
+
+
+class OrderSerializer(serializers.ModelSerializer):
+    lines = OrderLineSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = OrderModel
+        fields = ["id", "total_price", "created_at", "lines"]
 
 
 class AddCardSerializer(serializers.ModelSerializer):
@@ -1,3 +1,475 @@
-from django.test import TestCase
+import datetime
+from decimal import Decimal
+import threading
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from Products.models import ProductsModel
+from User.models import UserModel
+from .models import (
+    CartModel,
+    CartQuerySet,
+    IdempotencyKeyModel,
+    OrderLineModel,
+    OrderModel,
+    OutOfStock,
+    reserve_stock,
+)
+
+
+ORDER_URL = "/api/v1/cart/orderCart/"
+BATCH_URL = "/api/v1/cart/batch/"
+ADD_URL = "/api/v1/cart/addProduct/"
+ORDERS_URL = "/api/v1/cart/orders/"
+
+
+def make_user(email):
+    return UserModel.objects.create(email=email, password="Secret-pass1")
+
+
+def auth_client(user):
+    refresh = RefreshToken.for_user(user)
+    refresh["id"] = user.id
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+    return client
+
+
+class OrderCartStockTests(TestCase):
+    def setUp(self):
+        self.user = make_user("buyer@example.com")
+        self.client = auth_client(self.user)
+        self.lamp = ProductsModel.objects.create(title="Lamp", price=10, stock=5)
+        self.chair = ProductsModel.objects.create(title="Chair", price=20, stock=1)
+        self.poster = ProductsModel.objects.create(title="Poster", price=5)
+
+    def test_checkout_takes_items_out_of_stock(self):
+        CartModel.objects.create(user=self.user, product=self.lamp, quantity=2)
+        CartModel.objects.create(user=self.user, product=self.poster, quantity=3)
+
+        response = self.client.post(ORDER_URL)
+
+        self.assertEqual(response.status_code, 200)
+        self.lamp.refresh_from_db()
+        self.poster.refresh_from_db()
+        self.assertEqual(self.lamp.stock, 3)
+        self.assertIsNone(self.poster.stock)
+
+    def test_short_items_fail_the_whole_checkout(self):
+        CartModel.objects.create(user=self.user, product=self.lamp, quantity=2)
+        CartModel.objects.create(user=self.user, product=self.chair, quantity=3)
+
+        response = self.client.post(ORDER_URL)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["items"], [
+            {
+                "product_id": self.chair.id,
+                "title": "Chair",
+                "requested": 3,
+                "available": 1,
+            },
+        ])
+        self.lamp.refresh_from_db()
+        self.assertEqual(self.lamp.stock, 5)
+        self.assertEqual(CartModel.objects.active(self.user).count(), 2)
+        self.assertFalse(OrderModel.objects.exists())
+
+
+class ReserveStockTests(TestCase):
+    def test_product_deleted_after_the_cart_was_read_is_reported(self):
+        lamp = ProductsModel.objects.create(title="Lamp", price=10, stock=5)
+        gone = ProductsModel.objects.create(title="Gone", price=10, stock=5)
+        gone_id = gone.id
+        gone.delete()
+
+        with self.assertRaises(OutOfStock) as caught:
+            reserve_stock({lamp.id: 2, gone_id: 1})
+
+        self.assertEqual(caught.exception.items, [
+            {"product_id": gone_id, "title": "", "requested": 1, "available": 0},
+        ])
+        lamp.refresh_from_db()
+        self.assertEqual(lamp.stock, 5)
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    buyers = 12
+    stock = 5
+
+    def test_concurrent_checkouts_do_not_oversell(self):
+        product = ProductsModel.objects.create(title="Lamp", price=10, stock=self.stock)
+        clients = []
+        for number in range(self.buyers):
+            user = make_user(f"buyer{number}@example.com")
+            CartModel.objects.create(user=user, product=product, quantity=1)
+            clients.append(auth_client(user))
+
+        barrier = threading.Barrier(self.buyers)
+        statuses = []
+
+        def checkout(client):
+            try:
+                barrier.wait()
+                statuses.append(client.post(ORDER_URL).status_code)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=checkout, args=(client,)) for client in clients
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        sold_out = self.buyers - self.stock
+        self.assertEqual(sorted(statuses), [200] * self.stock + [409] * sold_out)
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(OrderModel.objects.count(), self.stock)
+
+
+class PurgeStaleCartsTests(TestCase):
+    def test_only_old_active_lines_are_deleted(self):
+        user = make_user("idle@example.com")
+        products = [
+            ProductsModel.objects.create(title=f"P{n}", price=1) for n in range(5)
+        ]
+        lines = [CartModel.objects.create(user=user, product=p) for p in products]
+        old = timezone.now() - datetime.timedelta(days=90)
+        CartModel.objects.filter(
+            id__in=[lines[0].id, lines[1].id, lines[2].id]
+        ).update(updated_at=old)
+        CartModel.objects.filter(id=lines[2].id).update(status="Sold")
+
+        out = StringIO()
+        call_command("purge_stale_carts", "--dry-run", stdout=out)
+        self.assertIn("Would delete 2 cart lines", out.getvalue())
+        self.assertEqual(CartModel.objects.count(), 5)
+
+        call_command(
+            "purge_stale_carts", "--batch-size", "1", "--sleep", "0", stdout=StringIO()
+        )
+        self.assertEqual(
+            sorted(CartModel.objects.values_list("id", flat=True)),
+            [lines[2].id, lines[3].id, lines[4].id],
+        )
+
+
+class ArchiveSoldCartsTests(TestCase):
+    def setUp(self):
+        self.alice = make_user("alice@example.com")
+        self.bob = make_user("bob@example.com")
+        lamp = ProductsModel.objects.create(title="Lamp", price="9.99")
+        pin = ProductsModel.objects.create(title="Pin", price="0.10")
+        CartModel.objects.create(
+            user=self.alice, product=lamp, quantity=2, status="Sold"
+        )
+        CartModel.objects.create(
+            user=self.alice, product=pin, quantity=3, status="Sold"
+        )
+        CartModel.objects.create(user=self.bob, product=pin, status="Sold")
+        self.active = CartModel.objects.create(user=self.bob, product=lamp)
+
+    def test_dry_run_changes_nothing(self):
+        out = StringIO()
+        call_command("archive_sold_carts", "--dry-run", stdout=out)
+
+        self.assertIn("Would archive 3 sold rows into 2 orders", out.getvalue())
+        self.assertEqual(CartModel.objects.count(), 4)
+        self.assertFalse(OrderModel.objects.exists())
+
+    def test_sold_rows_become_one_order_per_user(self):
+        out = StringIO()
+        call_command("archive_sold_carts", stdout=out)
+
+        self.assertIn("Archived 3 sold rows into 2 orders", out.getvalue())
+        self.assertEqual(
+            list(CartModel.objects.values_list("id", flat=True)), [self.active.id]
+        )
+        alice_order = OrderModel.objects.get(user=self.alice)
+        self.assertEqual(alice_order.total_price, Decimal("20.28"))
+        self.assertEqual(
+            sorted(alice_order.lines.values_list("title", "price", "quantity")),
+            [("Lamp", Decimal("9.99"), 2), ("Pin", Decimal("0.10"), 3)],
+        )
+        self.assertEqual(
+            OrderModel.objects.get(user=self.bob).total_price, Decimal("0.10")
+        )
+
+        call_command("archive_sold_carts", stdout=out)
+        self.assertEqual(OrderModel.objects.count(), 2)
+
+
+class OrderHistoryTests(TestCase):
+    def setUp(self):
+        self.user = make_user("history@example.com")
+        self.client = auth_client(self.user)
+        now = timezone.now()
+        self.orders = []
+        for n in range(12):
+            order = OrderModel.objects.create(
+                user=self.user,
+                total_price=n,
+                created_at=now - datetime.timedelta(days=n),
+            )
+            OrderLineModel.objects.bulk_create([
+                OrderLineModel(order=order, title=f"Item {n}", price=n, quantity=1),
+                OrderLineModel(order=order, title="Pin", price="0.10", quantity=2),
+            ])
+            self.orders.append(order)
+        OrderModel.objects.create(user=make_user("other@example.com"))
+
+    def test_orders_are_paginated_newest_first(self):
+        first = self.client.get(ORDERS_URL)
+        second = self.client.get(ORDERS_URL, {"page": 2})
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.data["count"], 12)
+        ids = [order["id"] for order in first.data["results"] + second.data["results"]]
+        self.assertEqual(ids, [order.id for order in self.orders])
+        self.assertEqual(len(first.data["results"]), 10)
+        self.assertIsNone(second.data["next"])
+        self.assertEqual(
+            [line["title"] for line in first.data["results"][0]["lines"]],
+            ["Item 0", "Pin"],
+        )
+
+    def test_lines_are_prefetched(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(ORDERS_URL)
+
+        self.assertEqual(len(response.data["results"]), 10)
+        # COUNT, the page of orders and one prefetch for all of their lines;
+        # the rest is authentication.
+        order_queries = [q["sql"] for q in queries if '"Cart_order' in q["sql"]]
+        self.assertEqual(len(order_queries), 3)
+        self.assertIn('"Cart_orderlinemodel"', order_queries[-1])
+
+
+class CartBatchTests(TestCase):
+    def setUp(self):
+        self.user = make_user("batch@example.com")
+        self.client = auth_client(self.user)
+        self.lamp = ProductsModel.objects.create(title="Lamp", price=10)
+        self.chair = ProductsModel.objects.create(title="Chair", price=20)
+
+    def post(self, *operations):
+        return self.client.post(
+            BATCH_URL, {"operations": list(operations)}, format="json"
+        )
+
+    def quantities(self):
+        lines = CartModel.objects.active(self.user)
+        return dict(lines.values_list("product__title", "quantity"))
+
+    def test_operations_apply_in_order(self):
+        CartModel.objects.create(user=self.user, product=self.chair, quantity=4)
+
+        response = self.post(
+            {"op": "add", "product_id": self.lamp.id, "quantity": 2},
+            {"op": "add", "product_id": self.lamp.id},
+            {"op": "set", "product_id": self.chair.id, "quantity": 1},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.quantities(), {"Lamp": 3, "Chair": 1})
+
+    def test_lines_created_concurrently_fall_back_to_per_item_updates(self):
+        real_bulk_update = CartModel.objects.bulk_update
+
+        def racing_bulk_update(*args, **kwargs):
+            # Another request adds the same products between read and insert.
+            for product in (self.lamp, self.chair):
+                CartModel.objects.create(user=self.user, product=product, quantity=5)
+            return real_bulk_update(*args, **kwargs)
+
+        with mock.patch.object(
+            CartModel.objects, "bulk_update", side_effect=racing_bulk_update
+        ):
+            response = self.post(
+                {"op": "add", "product_id": self.lamp.id, "quantity": 2},
+                {"op": "set", "product_id": self.chair.id, "quantity": 1},
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.quantities(), {"Lamp": 7, "Chair": 1})
+
+
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        self.user = make_user("retry@example.com")
+        self.client = auth_client(self.user)
+        self.lamp = ProductsModel.objects.create(title="Lamp", price=10)
+
+    def add(self, key, quantity=1):
+        return self.client.post(
+            ADD_URL,
+            {"product_id": self.lamp.id, "quantity": quantity},
+            format="json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def quantity(self):
+        return CartModel.objects.active(self.user).get().quantity
+
+    def test_retry_replays_the_first_response(self):
+        first = self.add("k1", quantity=2)
+        second = self.add("k1", quantity=2)
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(self.quantity(), 2)
+
+    def test_key_reused_for_another_request_is_rejected(self):
+        self.add("k1", quantity=2)
+
+        response = self.add("k1", quantity=3)
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.quantity(), 2)
+
+    def test_in_flight_key_conflicts_until_its_lease_runs_out(self):
+        self.add("k1")
+        record = IdempotencyKeyModel.objects.get(user=self.user, key="k1")
+        record.status_code = None
+        record.save()
+
+        self.assertEqual(self.add("k1").status_code, 409)
+        self.assertEqual(self.quantity(), 1)
+
+        record.created_at = timezone.now() - datetime.timedelta(minutes=5)
+        record.save()
+
+        response = self.add("k1")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(self.quantity(), 2)
+        self.assertEqual(
+            IdempotencyKeyModel.objects.get(user=self.user, key="k1").status_code, 200
+        )
+
+    def test_card_details_are_not_stored(self):
+        card = {
+            "card_name": "Visa",
+            "card_number": "4111111111111111",
+            "expiry_date": "12/30",
+            "cvv": "123",
+        }
+        response = self.client.post(
+            "/api/v1/cart/cards/", card, format="json", HTTP_IDEMPOTENCY_KEY="card"
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(IdempotencyKeyModel.objects.exists())
+
+
+class AddProductTests(TestCase):
+    def setUp(self):
+        self.user = make_user("adder@example.com")
+        self.client = auth_client(self.user)
+        self.lamp = ProductsModel.objects.create(title="Lamp", price=10)
+
+    def test_first_add_creates_the_line_and_later_adds_increment_it(self):
+        line, created = CartModel.add_product(self.user, self.lamp, 2)
+        self.assertTrue(created)
+        self.assertEqual(line.quantity, 2)
+
+        with self.assertNumQueries(2):
+            line, created = CartModel.add_product(self.user, self.lamp, 3)
+        self.assertFalse(created)
+        self.assertEqual(line.quantity, 5)
+        self.assertEqual(CartModel.objects.count(), 1)
+
+    def test_endpoint_answers_201_then_200_for_the_same_line(self):
+        payload = {"product_id": self.lamp.id, "quantity": 1}
+
+        first = self.client.post(ADD_URL, payload, format="json")
+        second = self.client.post(ADD_URL, payload, format="json")
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data["id"], first.data["id"])
+        self.assertEqual(second.data["quantity"], 2)
+
+    def test_losing_the_insert_race_falls_back_to_the_update(self):
+        CartModel.objects.create(user=self.user, product=self.lamp, quantity=4)
+        real_update = CartQuerySet.update
+        calls = []
+
+        def update(queryset, **kwargs):
+            calls.append(kwargs)
+            # The first UPDATE runs before the other request's insert lands.
+            if len(calls) == 1:
+                return 0
+            return real_update(queryset, **kwargs)
+
+        with mock.patch.object(CartQuerySet, "update", update):
+            line, created = CartModel.add_product(self.user, self.lamp, 2)
+
+        self.assertFalse(created)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(line.quantity, 6)
+        self.assertEqual(CartModel.objects.count(), 1)
+
+    def test_sold_lines_do_not_block_a_new_active_line(self):
+        CartModel.objects.create(
+            user=self.user, product=self.lamp, quantity=1, status="Sold"
+        )
+        line, created = CartModel.add_product(self.user, self.lamp, 1)
+        self.assertTrue(created)
+        self.assertEqual(CartModel.objects.count(), 2)
+
+
+class CartTotalsTests(TestCase):
+    def setUp(self):
+        self.user = make_user("totals@example.com")
+        self.client = auth_client(self.user)
+        lamp = ProductsModel.objects.create(title="Lamp", price="9.99")
+        pin = ProductsModel.objects.create(title="Pin", price="0.10")
+        book = ProductsModel.objects.create(title="Book", price="19.95")
+        CartModel.objects.create(user=self.user, product=lamp, quantity=4)
+        CartModel.objects.create(user=self.user, product=pin, quantity=3)
+        CartModel.objects.create(user=self.user, product=book, quantity=1)
+        # Neither sold lines nor other users' carts count.
+        CartModel.objects.create(
+            user=self.user, product=book, quantity=7, status="Sold"
+        )
+        CartModel.objects.create(user=make_user("other@example.com"), product=lamp)
+
+    def test_line_totals_are_exact_cents(self):
+        response = self.client.get("/api/v1/cart/getCart/")
+
+        totals = {
+            line["product"]["title"]: line["total_price"] for line in response.data
+        }
+        self.assertEqual(totals, {
+            "Lamp": Decimal("39.96"), "Pin": Decimal("0.30"), "Book": Decimal("19.95"),
+        })
+        self.assertEqual(str(totals["Lamp"]), "39.96")
+
+    def test_summary_matches_the_hand_computed_cart(self):
+        response = self.client.get("/api/v1/cart/summary/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data, {"lines": 3, "items": 8, "total_price": "60.21"}
+        )
+
+    def test_empty_cart_summary(self):
+        client = auth_client(make_user("empty@example.com"))
+        response = client.get("/api/v1/cart/summary/")
+        self.assertEqual(
+            response.data, {"lines": 0, "items": 0, "total_price": "0.00"}
+        )
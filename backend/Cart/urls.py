@@ -1,16 +1,22 @@
 from django.urls import path
 from .views import (
     GetCartView,
+    CartSummaryView,
     AddProductView,
     DeleteProductView,
     OrderCartView,
+    OrderHistoryView,
+    CartBatchView,
     UserCardsView,
 )
 
 urlpatterns = [
     path("getCart/", GetCartView.as_view(), name="cart-get"),
+    path("summary/", CartSummaryView.as_view(), name="cart-summary"),
     path("addProduct/", AddProductView.as_view(), name="cart-add-product"),
     path("deleteProduct/<int:product_id>/", DeleteProductView.as_view(), name="cart-delete-product"),
+    path("batch/", CartBatchView.as_view(), name="cart-batch"),
     path("orderCart/", OrderCartView.as_view(), name="cart-order"),
+    path("orders/", OrderHistoryView.as_view(), name="cart-orders"),
     path("cards/", UserCardsView.as_view(), name="user-cards"),
 ]
@@ -1,12 +1,20 @@
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 from rest_framework import generics, status
 from rest_framework.views import APIView
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from Products.models import ProductsModel
-from .models import CartModel, AddCardModel
-from .serializers import CartSerializer, AddCardSerializer
+from .models import (
+    CartModel, AddCardModel, OrderModel, OrderLineModel, OutOfStock, reserve_stock
+)
+from .serializers import (
+    CartSerializer, AddCardSerializer, CartBatchSerializer, OrderSerializer
+)
 from User.authentication import CustomUserJWTAuthentication
+from .idempotency import idempotent
 
 
 class GetCartView(generics.ListAPIView):
@@ -20,7 +28,35 @@ class GetCartView(generics.ListAPIView):
         responses={200: CartSerializer(many=True), 401: "Authentication required"},
     )
     def get_queryset(self):
-        return CartModel.objects.filter(user=self.request.user, status="Active")
+        return CartModel.objects.active(self.request.user).with_line_totals()
+
+
+class CartSummaryView(APIView):
+    authentication_classes = [CustomUserJWTAuthentication]
+
+    @swagger_auto_schema(
+        tags=["Cart"],
+        operation_summary="Cart summary",
+        operation_description=(
+            "Returns the number of lines, the number of items and the total price "
+            "of the authenticated user's active cart, without the lines themselves."
+        ),
+        responses={
+            200: openapi.Response(
+                description="Cart summary",
+                examples={
+                    "application/json": {
+                        "lines": 2, "items": 5, "total_price": "240.00"
+                    }
+                },
+            ),
+            401: "Authentication required",
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        summary = CartModel.objects.active(request.user).summary()
+        summary["total_price"] = f"{summary['total_price']:.2f}"
+        return Response(summary, status=status.HTTP_200_OK)
 
 
 class AddProductView(APIView):
@@ -29,7 +65,10 @@ class AddProductView(APIView):
     @swagger_auto_schema(
         tags=["Cart"],
         operation_summary="Add product to cart",
-        operation_description="Creates a cart item with status Active for the authenticated user.",
+        operation_description=(
+            "Adds the product to the authenticated user's active cart. If the "
+            "product is already in the cart its quantity is increased."
+        ),
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
             required=["product_id", "quantity"],
@@ -40,11 +79,13 @@ class AddProductView(APIView):
         ),
         responses={
             201: CartSerializer,
+            200: "Existing cart item, quantity increased",
             400: "Validation error",
             404: "Product not found",
             401: "Authentication required",
         },
     )
+    @idempotent
     def post(self, request, *args, **kwargs):
         product_id = request.data.get("product_id")
         quantity = request.data.get("quantity", 1)
@@ -65,14 +106,12 @@ class AddProductView(APIView):
         except ProductsModel.DoesNotExist:
             return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        cart_item = CartModel.objects.create(
-            user=request.user,
-            product=product,
-            quantity=quantity,
-            status="Active",
-        )
+        cart_item, created = CartModel.add_product(request.user, product, quantity)
         serializer = CartSerializer(cart_item)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(
+            serializer.data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
 
 
 class DeleteProductView(APIView):
@@ -97,43 +136,237 @@ class DeleteProductView(APIView):
             401: "Authentication required",
         },
     )
+    @idempotent
     def delete(self, request, product_id, *args, **kwargs):
-        cart_item = CartModel.objects.filter(
+        deleted, _ = CartModel.objects.filter(
             user=request.user,
             product_id=product_id,
             status="Active",
-        ).first()
+        ).delete()
 
-        if not cart_item:
+        if not deleted:
             return Response({"error": "Cart item not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        cart_item.delete()
         return Response({"message": "Product removed from cart"}, status=status.HTTP_200_OK)
 
 
+class CartBatchView(APIView):
+    authentication_classes = [CustomUserJWTAuthentication]
+
+    @swagger_auto_schema(
+        tags=["Cart"],
+        operation_summary="Apply several cart changes at once",
+        operation_description=(
+            "Applies a list of operations to the authenticated user's active cart "
+            "in one transaction and returns the resulting cart. Operations run in "
+            "order: `add` increases the quantity (default 1), `set` replaces it "
+            "(0 removes the line) and `remove` deletes the line. If any product "
+            "does not exist nothing is applied."
+        ),
+        request_body=CartBatchSerializer,
+        responses={
+            200: CartSerializer(many=True),
+            400: "Validation error or unknown products",
+            401: "Authentication required",
+        },
+    )
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        serializer = CartBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        operations = serializer.validated_data["operations"]
+
+        product_ids = {operation["product_id"] for operation in operations}
+        existing = set(
+            ProductsModel.objects.filter(id__in=product_ids)
+            .values_list("id", flat=True)
+        )
+        missing = sorted(product_ids - existing)
+        if missing:
+            return Response(
+                {"error": "Products not found", "missing": missing},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        with transaction.atomic():
+            lines = {
+                line.product_id: line
+                for line in CartModel.objects.select_for_update().filter(
+                    user=request.user, status="Active", product_id__in=product_ids
+                )
+            }
+            quantities = {pid: line.quantity for pid, line in lines.items()}
+            # Products whose final quantity does not depend on the current one.
+            absolute = set()
+            for operation in operations:
+                pid = operation["product_id"]
+                if operation["op"] == "add":
+                    added = operation.get("quantity", 1)
+                    quantities[pid] = quantities.get(pid, 0) + added
+                elif operation["op"] == "set":
+                    quantities[pid] = operation["quantity"]
+                    absolute.add(pid)
+                else:
+                    quantities[pid] = 0
+                    absolute.add(pid)
+
+            now = timezone.now()
+            to_create, to_update, to_delete = [], [], []
+            for pid, quantity in quantities.items():
+                line = lines.get(pid)
+                if quantity == 0:
+                    if line is not None:
+                        to_delete.append(line.id)
+                elif line is None:
+                    to_create.append(CartModel(
+                        user=request.user,
+                        product_id=pid,
+                        quantity=quantity,
+                        status="Active",
+                    ))
+                elif line.quantity != quantity:
+                    line.quantity = quantity
+                    line.updated_at = now
+                    to_update.append(line)
+
+            if to_delete:
+                CartModel.objects.filter(id__in=to_delete).delete()
+            CartModel.objects.bulk_update(to_update, ["quantity", "updated_at"])
+            try:
+                with transaction.atomic():
+                    CartModel.objects.bulk_create(to_create)
+            except IntegrityError:
+                # A concurrent request created some of these lines since they
+                # were read: apply them one by one on top of what is there now.
+                for line in to_create:
+                    active = CartModel.objects.filter(
+                        user=request.user, product_id=line.product_id, status="Active"
+                    )
+                    if line.product_id in absolute and active.update(
+                        quantity=line.quantity, updated_at=now
+                    ):
+                        continue
+                    CartModel.add_product(request.user, line.product, line.quantity)
+
+        cart = CartModel.objects.active(request.user).with_line_totals()
+        serializer = CartSerializer(cart, many=True, context={"request": request})
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
 class OrderCartView(APIView):
     authentication_classes = [CustomUserJWTAuthentication]
 
     @swagger_auto_schema(
         tags=["Cart"],
         operation_summary="Order cart items",
-        operation_description="Marks all active cart items for the authenticated user as Sold.",
+        operation_description=(
+            "Turns all active cart items of the authenticated user into an order "
+            "with the current prices, takes the items out of stock and empties the "
+            "cart. If any product does not have enough stock nothing is ordered "
+            "and the short items are listed."
+        ),
         responses={
             200: openapi.Response(
                 description="Order placed",
-                examples={"application/json": {"message": "Order placed", "updated": 3}},
+                examples={
+                    "application/json": {
+                        "message": "Order placed",
+                        "updated": 3,
+                        "order_id": 12,
+                        "total_price": "240.00",
+                    }
+                },
             ),
             400: "No active items to order",
             401: "Authentication required",
+            409: openapi.Response(
+                description="Not enough stock",
+                examples={
+                    "application/json": {
+                        "error": "Not enough stock",
+                        "items": [
+                            {
+                                "product_id": 7,
+                                "title": "Lamp",
+                                "requested": 3,
+                                "available": 1,
+                            }
+                        ],
+                    }
+                },
+            ),
         },
     )
+    @idempotent
     def post(self, request, *args, **kwargs):
-        active_items = CartModel.objects.filter(user=request.user, status="Active")
-        if not active_items.exists():
-            return Response({"error": "No active items to order"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            with transaction.atomic():
+                return self.place_order(request)
+        except OutOfStock as e:
+            return Response(
+                {"error": str(e), "items": e.items}, status=status.HTTP_409_CONFLICT
+            )
 
-        updated = active_items.update(status="Sold")
-        return Response({"message": "Order placed", "updated": updated}, status=status.HTTP_200_OK)
+    def place_order(self, request):
+        lines = list(
+            CartModel.objects.active(request.user)
+            .with_line_totals()
+            .select_for_update()
+        )
+        if not lines:
+            return Response(
+                {"error": "No active items to order"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        reserve_stock({line.product_id: line.quantity for line in lines})
+        order = OrderModel.objects.create(
+            user=request.user,
+            total_price=sum(line.line_total for line in lines),
+        )
+        OrderLineModel.objects.bulk_create(
+            [line.to_order_line(order) for line in lines]
+        )
+        CartModel.objects.filter(id__in=[line.id for line in lines]).delete()
+
+        return Response(
+            {
+                "message": "Order placed",
+                "updated": len(lines),
+                "order_id": order.id,
+                "total_price": f"{order.total_price:.2f}",
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class OrderPagination(PageNumberPagination):
+    page_size = 10
+    page_query_param = "page"
+
+
+class OrderHistoryView(generics.ListAPIView):
+    serializer_class = OrderSerializer
+    pagination_class = OrderPagination
+    authentication_classes = [CustomUserJWTAuthentication]
+
+    def get_queryset(self):
+        return OrderModel.objects.filter(user=self.request.user).prefetch_related(
+            "lines"
+        )
+
+    @swagger_auto_schema(
+        tags=["Cart"],
+        operation_summary="Order history",
+        operation_description=(
+            "Returns the authenticated user's orders, newest first, with the "
+            "prices recorded at sale time."
+        ),
+        responses={200: OrderSerializer(many=True), 401: "Authentication required"},
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
 
 class UserCardsView(generics.ListCreateAPIView):
@@ -164,6 +397,7 @@ class UserCardsView(generics.ListCreateAPIView):
         },
     )
     def post(self, request, *args, **kwargs):
+        # Not idempotent on purpose: the stored reply would hold the card data.
         return super().post(request, *args, **kwargs)
 
     def perform_create(self, serializer):
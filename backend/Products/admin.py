@@ -4,6 +4,6 @@ from .models import ProductCategoryModel, ProductsModel
 
 @admin.register(ProductsModel)
 class ProductModelAdmin(admin.ModelAdmin):
-    list_display = ['title','id','category','price']
+    list_display = ['title', 'id', 'sku', 'category', 'price', 'stock']
 
 admin.site.register(ProductCategoryModel)
\ No newline at end of file
@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def setup_search_index(sender, **kwargs):
+    from .search import rebuild_search_index, search_index_exists
+
+    if not search_index_exists():
+        rebuild_search_index()
 
 
 class ProductsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "Products"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        post_migrate.connect(setup_search_index, sender=self)
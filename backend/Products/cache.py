@@ -0,0 +1,85 @@
+import datetime
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from .conditional import ConditionalGetMixin
+
+
+VERSION_KEY = "catalog:version"
+
+
+def catalog_cache():
+    return caches["catalog"]
+
+
+def get_catalog_version():
+    version = caches["catalog_version"].get(VERSION_KEY)
+    if version is None:
+        version = bump_catalog_version()
+    return version
+
+
+def bump_catalog_version():
+    # A fresh timestamp instead of incr(): the version store is shared by all
+    # workers and concurrent bumps must never collapse into the same value.
+    version = time.time_ns()
+    caches["catalog_version"].set(VERSION_KEY, version, None)
+    return version
+
+
+def schedule_catalog_version_bump():
+    transaction.on_commit(bump_catalog_version)
+
+
+def catalog_cache_key(request):
+    return "catalog:{}:{}:{}".format(
+        get_catalog_version(), request.get_host(), request.get_full_path()
+    )
+
+
+class CatalogCacheMixin(ConditionalGetMixin):
+    """
+    Serves GET responses of catalog views, and their ETag / Last-Modified
+    validators, from the catalog cache. Entries are keyed by the catalog
+    version, so any product or category change makes every older entry
+    unreachable and the LRU bound evicts it. The version is also part of the
+    ETag and the floor of Last-Modified, which covers deletions without a
+    COUNT(*) over the list.
+    """
+
+    etag_row_count = False
+
+    def get_deletion_marker(self):
+        # The version is the time_ns() of the last committed catalog change,
+        # deletions included.
+        return datetime.datetime.fromtimestamp(
+            get_catalog_version() / 1e9, tz=datetime.timezone.utc
+        )
+
+    def get_validators(self, request, extra_etag_parts=()):
+        version = get_catalog_version()
+        key = "catalog:{}:{}:{}:validators".format(
+            version, request.get_host(), request.get_full_path()
+        )
+        validators = catalog_cache().get(key)
+        if validators is None:
+            validators = super().get_validators(
+                request, extra_etag_parts=(*extra_etag_parts, str(version))
+            )
+            catalog_cache().set(key, validators)
+        return validators
+
+    def get_response(self, request, *args, **kwargs):
+        cache = catalog_cache()
+        key = catalog_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().get_response(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data)
+        return response
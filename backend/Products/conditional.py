@@ -0,0 +1,125 @@
+import datetime
+import hashlib
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+
+def deletion_key(label):
+    return f"deleted:{label}"
+
+
+def record_deletion(label):
+    # Kept next to the catalog version, which every worker on the host shares.
+    stamp = time.time_ns()
+    caches["catalog_version"].set(deletion_key(label), stamp, None)
+    return stamp
+
+
+def schedule_deletion_record(label):
+    transaction.on_commit(lambda: record_deletion(label))
+
+
+def get_deletion_time(label):
+    """
+    ``time_ns()`` of the last committed deletion of ``label`` rows. A store
+    that lost the entry cannot tell, so it starts over at now.
+    """
+    stamp = caches["catalog_version"].get(deletion_key(label))
+    if stamp is None:
+        stamp = record_deletion(label)
+    return stamp
+
+
+class ConditionalGetMixin:
+    """
+    Adds strong ETag / Last-Modified validators to list and detail views.
+
+    Validators come from one aggregate query over ``last_modified_fields``
+    (plus a row count unless ``etag_row_count`` is off, so deletions change
+    the ETag), and a matching ``If-None-Match`` / ``If-Modified-Since`` is
+    answered with 304 before anything is serialized.
+
+    MAX(updated_at) never moves backward when a row is deleted, so
+    Last-Modified is only sent by views whose ``get_deletion_marker`` can
+    tell when rows last went away: set ``deletion_label`` and call
+    ``schedule_deletion_record`` with it from a post_delete receiver.
+    """
+
+    last_modified_fields = ("updated_at",)
+    etag_row_count = True
+    deletion_label = None
+
+    def get_conditional_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in self.kwargs:
+            lookup = {self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            queryset = queryset.filter(**lookup)
+        return queryset.order_by()
+
+    def get_deletion_marker(self):
+        """Datetime of the latest deletion visible here, or None if unknown."""
+        if self.deletion_label is None:
+            return None
+        return datetime.datetime.fromtimestamp(
+            get_deletion_time(self.deletion_label) / 1e9, tz=datetime.timezone.utc
+        )
+
+    def get_validators(self, request, extra_etag_parts=()):
+        aggregates = {
+            f"last_{index}": Max(field)
+            for index, field in enumerate(self.last_modified_fields)
+        }
+        if self.etag_row_count:
+            aggregates["count"] = Count("pk")
+        values = self.get_conditional_queryset().aggregate(**aggregates)
+
+        timestamps = [
+            value for key, value in values.items()
+            if key != "count" and value is not None
+        ]
+        if not timestamps:
+            return None, None
+        last_modified = max(timestamps)
+
+        source = "|".join(
+            [request.get_host(), request.get_full_path(), *extra_etag_parts]
+            + [str(values[key]) for key in sorted(values)]
+        )
+        etag = quote_etag(hashlib.md5(source.encode()).hexdigest())
+
+        marker = self.get_deletion_marker()
+        if marker is None:
+            return etag, None
+        return etag, int(max(last_modified, marker).timestamp())
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        if etag is None:
+            return self.get_response(request, *args, **kwargs)
+
+        # If-None-Match wins over If-Modified-Since whenever both are sent.
+        not_modified = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=(
+                None if "HTTP_IF_NONE_MATCH" in request.META else last_modified
+            ),
+        )
+        if not_modified is not None:
+            return not_modified
+
+        response = self.get_response(request, *args, **kwargs)
+        if response.status_code == 200:
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def get_response(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
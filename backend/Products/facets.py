@@ -0,0 +1,141 @@
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db.models import Count, Max, Min, Q
+from rest_framework.exceptions import ValidationError
+
+
+PRICE_BUCKETS = tuple(
+    getattr(settings, "PRODUCT_PRICE_BUCKETS", (0, 50, 100, 250, 500, 1000))
+)
+
+ORDERINGS = {
+    "price": ("price", "id"),
+    "-price": ("-price", "-id"),
+}
+
+
+class CatalogFilters:
+    """
+    Parsed ``categoryId`` (one id or a comma separated list), ``minPrice``,
+    ``maxPrice`` and ``ordering`` query parameters of the product list.
+    """
+
+    def __init__(self, params):
+        self.category_ids = self._parse_ids(params.get("categoryId"))
+        self.min_price = self._parse_price(params, "minPrice")
+        self.max_price = self._parse_price(params, "maxPrice")
+
+        ordering = params.get("ordering")
+        if ordering and ordering not in ORDERINGS:
+            raise ValidationError(
+                {"ordering": f"Must be one of: {', '.join(ORDERINGS)}"}
+            )
+        self.ordering = ORDERINGS.get(ordering)
+
+    @staticmethod
+    def _parse_ids(value):
+        if not value:
+            return []
+        try:
+            return [int(part) for part in value.split(",") if part.strip()]
+        except ValueError:
+            raise ValidationError({
+                "categoryId": "Must be an integer or a comma separated list of integers"
+            })
+
+    @staticmethod
+    def _parse_price(params, name):
+        value = params.get(name)
+        if value in (None, ""):
+            return None
+        try:
+            price = Decimal(value)
+        except InvalidOperation:
+            price = None
+        if price is None or not price.is_finite():
+            raise ValidationError({name: "Must be a number"})
+        return price
+
+    @property
+    def price_q(self):
+        q = Q()
+        if self.min_price is not None:
+            q &= Q(price__gte=self.min_price)
+        if self.max_price is not None:
+            q &= Q(price__lte=self.max_price)
+        return q
+
+    def apply(self, queryset):
+        if len(self.category_ids) == 1:
+            queryset = queryset.filter(category_id=self.category_ids[0])
+        elif self.category_ids:
+            queryset = queryset.filter(category_id__in=self.category_ids)
+        return queryset.filter(self.price_q)
+
+
+def format_price(value):
+    # SQLite hands MIN/MAX of a decimal column back as float.
+    return None if value is None else f"{Decimal(value):.2f}"
+
+
+def price_bucket_q(index):
+    q = Q(price__gte=PRICE_BUCKETS[index])
+    if index + 1 < len(PRICE_BUCKETS):
+        q &= Q(price__lt=PRICE_BUCKETS[index + 1])
+    return q
+
+
+def product_facets(queryset, filters):
+    """
+    Category counts and price buckets from a single GROUP BY category query.
+
+    ``queryset`` must not carry the category/price filters yet: category
+    counts respect the price range but ignore the selected categories, and
+    price buckets respect the selected categories but ignore the price
+    range, so each facet shows what picking another value would return.
+    """
+    aggregates = {
+        "count": Count("id", filter=filters.price_q),
+        "min_price": Min("price"),
+        "max_price": Max("price"),
+    }
+    for index in range(len(PRICE_BUCKETS)):
+        aggregates[f"bucket_{index}"] = Count("id", filter=price_bucket_q(index))
+
+    rows = (
+        queryset.order_by()
+        .values("category_id", "category__name")
+        .annotate(**aggregates)
+        .order_by("category__name")
+    )
+
+    categories = []
+    bucket_counts = [0] * len(PRICE_BUCKETS)
+    prices = []
+    for row in rows:
+        if row["count"]:
+            categories.append({
+                "id": row["category_id"],
+                "name": row["category__name"],
+                "count": row["count"],
+            })
+        if filters.category_ids and row["category_id"] not in filters.category_ids:
+            continue
+        prices += [row["min_price"], row["max_price"]]
+        for index in range(len(PRICE_BUCKETS)):
+            bucket_counts[index] += row[f"bucket_{index}"]
+
+    buckets = []
+    for index, count in enumerate(bucket_counts):
+        upper = PRICE_BUCKETS[index + 1] if index + 1 < len(PRICE_BUCKETS) else None
+        buckets.append({"from": PRICE_BUCKETS[index], "to": upper, "count": count})
+
+    return {
+        "categories": categories,
+        "price": {
+            "min": format_price(min(prices)) if prices else None,
+            "max": format_price(max(prices)) if prices else None,
+            "buckets": buckets,
+        },
+    }
@@ -0,0 +1,173 @@
+import logging
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models.signals import post_init
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+logger = logging.getLogger(__name__)
+
+VARIANT_WIDTHS = tuple(getattr(settings, "IMAGE_VARIANT_WIDTHS", (160, 320, 640)))
+EXIF_ORIENTATION = 0x0112
+VARIANT_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def variant_name(name, width, extension):
+    root, _ = posixpath.splitext(name)
+    directory, base = posixpath.split(root)
+    return posixpath.join(directory, "variants", f"{base}_{width}.{extension}")
+
+
+def variant_names(name, widths=None):
+    return [
+        (width, extension, variant_name(name, width, extension))
+        for width in widths or VARIANT_WIDTHS
+        for extension in VARIANT_FORMATS
+    ]
+
+
+def variant_widths_attname(fieldfile):
+    return f"{fieldfile.field.name}_variant_widths"
+
+
+def built_variant_widths(fieldfile):
+    """Widths ``generate_variants`` last recorded for the file, if any."""
+    return fieldfile.instance.__dict__.get(variant_widths_attname(fieldfile)) or []
+
+
+def record_variant_widths(fieldfile, widths):
+    """
+    Stores the widths whose variants all exist in ``<field>_variant_widths``
+    of the owning row, so reads never have to ask the storage. Models
+    without that column are left alone.
+    """
+    instance = fieldfile.instance
+    attname = variant_widths_attname(fieldfile)
+    widths = sorted(widths)
+    if attname not in {f.attname for f in instance._meta.concrete_fields}:
+        return
+    if instance.__dict__.get(attname) == widths:
+        return
+    instance.__dict__[attname] = widths
+    if instance.pk is not None:
+        # A plain UPDATE: no post_save, no auto_now and no profile version bump.
+        type(instance)._default_manager.filter(pk=instance.pk).update(
+            **{attname: widths}
+        )
+
+
+def variant_urls(fieldfile, request=None):
+    """Variant URLs by width and format, for the widths recorded as built."""
+    if not fieldfile:
+        return None
+    widths = built_variant_widths(fieldfile)
+    if not widths:
+        return {}
+    urls = {}
+    for width, extension, name in variant_names(fieldfile.name, widths):
+        url = fieldfile.storage.url(name)
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        urls.setdefault(str(width), {})[extension] = url
+    return urls
+
+
+def track_image_changes(model, field):
+    """
+    Remembers the stored name of ``model.<field>`` whenever an instance is
+    built, so post_save receivers can ask ``image_changed`` instead of
+    probing storage on every save.
+    """
+    def remember(sender, instance, **kwargs):
+        value = instance.__dict__.get(field)
+        instance.__dict__[f"_stored_{field}"] = getattr(value, "name", value) or None
+
+    post_init.connect(remember, sender=model, weak=False)
+
+
+def image_changed(instance, field):
+    """True if ``field`` holds another file than when it was loaded or last saved."""
+    name = getattr(instance, field).name or None
+    changed = name != instance.__dict__.get(f"_stored_{field}")
+    instance.__dict__[f"_stored_{field}"] = name
+    return changed
+
+
+def flatten(image):
+    if image.mode in ("RGB", "L"):
+        return image
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def generate_variants(fieldfile, force=False, widths=None):
+    """
+    Writes the resized WebP/JPEG variants of ``fieldfile`` next to it and
+    returns how many were written. Variants that already exist are skipped
+    unless ``force`` is set; the original is only decoded when something is
+    missing. Widths (``VARIANT_WIDTHS`` by default) at or above the width of
+    the original are never written, as they would only be copies of it.
+    The widths that end up complete are recorded on the owning row.
+    """
+    if not fieldfile:
+        return 0
+
+    storage = fieldfile.storage
+    names = variant_names(fieldfile.name, widths)
+    missing = [
+        (width, extension, name)
+        for width, extension, name in names
+        if force or not storage.exists(name)
+    ]
+    built = {width for width, _, _ in names} - {width for width, _, _ in missing}
+    if not missing:
+        record_variant_widths(fieldfile, built)
+        return 0
+
+    try:
+        with fieldfile.open("rb") as source, Image.open(source) as original:
+            # Width as displayed, read from the header before anything is
+            # decoded; variants at least this wide would only be copies.
+            turned = original.getexif().get(EXIF_ORIENTATION) in (5, 6, 7, 8)
+            full_width = original.height if turned else original.width
+            missing = [variant for variant in missing if variant[0] < full_width]
+            if not missing:
+                record_variant_widths(fieldfile, built)
+                return 0
+            # JPEG only: let the decoder downscale by 1/2..1/8 while both
+            # sides stay above the largest variant (EXIF may rotate later).
+            largest = max(width for width, _, _ in missing)
+            original.draft("RGB", (largest, largest))
+            image = flatten(ImageOps.exif_transpose(original))
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+        logger.warning("Cannot build variants for %s: %s", fieldfile.name, e)
+        record_variant_widths(fieldfile, built)
+        return 0
+
+    source_width, source_height = image.size
+    written = 0
+    # Largest first, so every smaller variant is resampled from a smaller image.
+    for width in sorted({width for width, _, _ in missing}, reverse=True):
+        height = max(1, round(source_height * width / source_width))
+        image = image.resize((width, height), Image.LANCZOS)
+        for _, extension, name in (v for v in missing if v[0] == width):
+            image_format, options = VARIANT_FORMATS[extension]
+            buffer = BytesIO()
+            image.save(buffer, image_format, **options)
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, ContentFile(buffer.getvalue()))
+            written += 1
+        built.add(width)
+    record_variant_widths(fieldfile, built)
+    return written
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Products.snapshots import SNAPSHOT_ROOT, build_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-render the category list and product pages as static, "
+        "pre-compressed JSON."
+    )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        version = build_snapshot()
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Snapshot {version} ready in {SNAPSHOT_ROOT} ({elapsed:.2f}s)"
+            )
+        )
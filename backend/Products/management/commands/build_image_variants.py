@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Products.cache import bump_catalog_version
+from Products.images import generate_variants
+from Products.models import ProductsModel
+from reklama.models import Advertisement
+from User.avatars import AVATAR_VARIANT_WIDTHS
+from User.models import UserModel
+
+
+IMAGE_FIELDS = (
+    (ProductsModel, "image", None),
+    (Advertisement, "image", None),
+    (UserModel, "profile_image", AVATAR_VARIANT_WIDTHS),
+)
+
+
+class Command(BaseCommand):
+    help = "Build resized WebP/JPEG variants for product, banner and profile images."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Rebuild variants even if they already exist.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        for model, field, widths in IMAGE_FIELDS:
+            images = written = 0
+            queryset = (
+                model.objects.exclude(**{field: ""})
+                .exclude(**{f"{field}__isnull": True})
+                .only("pk", field, f"{field}_variant_widths")
+                .order_by("pk")
+            )
+            for obj in queryset.iterator(chunk_size=500):
+                images += 1
+                written += generate_variants(
+                    getattr(obj, field), force=options["force"], widths=widths
+                )
+            self.stdout.write(
+                f"{model._meta.label}: {images} images, {written} variants written"
+            )
+        # Cached catalog replies list the variants recorded before this run.
+        bump_catalog_version()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Done in {elapsed:.2f}s"))
@@ -0,0 +1,167 @@
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from Products.cache import bump_catalog_version
+from Products.models import ProductCategoryModel, ProductsModel
+from Products.search import index_products
+
+
+UPDATE_FIELDS = [
+    "title",
+    "description",
+    "category",
+    "price",
+    "image",
+    "image_variant_widths",
+    "updated_at",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream a CSV or JSONL catalog file into ProductsModel. Rows are upserted "
+        "by sku in batches; columns: sku, title, description, category, price, image."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or JSONL file to import.")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "jsonl"],
+            help="File format. Guessed from the extension when omitted.",
+        )
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"] or ("csv" if path.endswith(".csv") else "jsonl")
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        self.categories = dict(ProductCategoryModel.objects.values_list("name", "id"))
+        self.created = self.updated = self.skipped = 0
+        started = time.monotonic()
+
+        try:
+            newline = "" if file_format == "csv" else None
+            source = open(path, newline=newline, encoding="utf-8")
+        except OSError as e:
+            raise CommandError(f"Cannot open {path}: {e}")
+
+        with source:
+            rows = self.read_rows(source, file_format)
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                self.import_batch(batch)
+                processed = self.created + self.updated + self.skipped
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"{processed} rows, {processed / max(elapsed, 1e-9):.0f} rows/s"
+                )
+
+        if self.created or self.updated:
+            bump_catalog_version()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {self.created}, updated {self.updated}, "
+                f"skipped {self.skipped} "
+                f"in {elapsed:.2f}s. Run build_image_variants for new images."
+            )
+        )
+
+    def read_rows(self, source, file_format):
+        if file_format == "csv":
+            for line_number, row in enumerate(csv.DictReader(source), start=2):
+                yield line_number, row
+            return
+        for line_number, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as e:
+                self.warn(line_number, f"invalid JSON ({e})")
+
+    def warn(self, line_number, message):
+        self.skipped += 1
+        self.stderr.write(f"line {line_number}: {message}, skipped")
+
+    def category_id(self, name):
+        name = (name or "").strip()
+        if not name:
+            return None
+        if name not in self.categories:
+            self.categories[name] = ProductCategoryModel.objects.create(name=name).id
+        return self.categories[name]
+
+    def build_product(self, line_number, row):
+        if not isinstance(row, dict):
+            self.warn(line_number, f"expected an object, got {type(row).__name__}")
+            return None
+        try:
+            price = Decimal(str(row.get("price") or 0))
+        except InvalidOperation:
+            self.warn(line_number, f"invalid price {row.get('price')!r}")
+            return None
+        return ProductsModel(
+            sku=(row.get("sku") or "").strip() or None,
+            title=row.get("title") or "",
+            description=row.get("description") or "",
+            category_id=self.category_id(row.get("category")),
+            price=price,
+            image=row.get("image") or "",
+        )
+
+    def import_batch(self, batch):
+        # Last row wins when a sku repeats inside the batch.
+        by_sku = {}
+        without_sku = []
+        for line_number, row in batch:
+            product = self.build_product(line_number, row)
+            if product is None:
+                continue
+            if product.sku:
+                by_sku[product.sku] = product
+            else:
+                without_sku.append(product)
+
+        existing = {
+            sku: (pk, image, widths)
+            for sku, pk, image, widths in ProductsModel.objects.filter(
+                sku__in=list(by_sku)
+            ).values_list("sku", "id", "image", "image_variant_widths")
+        }
+        now = timezone.now()
+        to_update = []
+        to_create = without_sku
+        for sku, product in by_sku.items():
+            if sku in existing:
+                product.id, image, widths = existing[sku]
+                # Variants recorded for the old image do not exist for a new one.
+                if product.image.name == image:
+                    product.image_variant_widths = widths
+                product.updated_at = now
+                to_update.append(product)
+            else:
+                to_create.append(product)
+
+        with transaction.atomic():
+            created = ProductsModel.objects.bulk_create(to_create)
+            ProductsModel.objects.bulk_update(to_update, UPDATE_FIELDS)
+            # bulk_create/bulk_update bypass the post_save hooks that feed search.
+            index_products(created + to_update)
+
+        self.created += len(created)
+        self.updated += len(to_update)
@@ -0,0 +1,33 @@
+import os
+
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .snapshots import LATEST_NAME, SNAPSHOT_ROOT, SNAPSHOT_URL
+
+
+class CatalogSnapshotMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that also serves the catalog snapshots. Snapshot versions are
+    published while the server runs, so they are looked up on disk per
+    request instead of from the startup file index. Everything below a
+    version directory never changes and is marked immutable; ``latest.json``
+    keeps the normal short max-age.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.snapshot_prefix = "/" + SNAPSHOT_URL.strip("/") + "/"
+        root = os.path.abspath(SNAPSHOT_ROOT).rstrip(os.path.sep) + os.path.sep
+        self.directories.insert(0, (root, self.snapshot_prefix))
+
+    def __call__(self, request):
+        if request.path_info.startswith(self.snapshot_prefix):
+            static_file = self.find_file(request.path_info)
+            if static_file is not None:
+                return self.serve(static_file, request)
+        return super().__call__(request)
+
+    def immutable_file_test(self, path, url):
+        if url.startswith(self.snapshot_prefix):
+            return url != self.snapshot_prefix + LATEST_NAME
+        return super().immutable_file_test(path, url)
@@ -2,17 +2,32 @@ from django.db import models
 
 class ProductCategoryModel(models.Model):
     name = models.CharField(max_length=255,default="")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.name
     
 
 class ProductsModel(models.Model):
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     title = models.CharField(max_length=255, default="")
     description = models.TextField(default="")
     category = models.ForeignKey(ProductCategoryModel, on_delete=models.SET_NULL, null=True)
     price = models.DecimalField(default=0, max_digits=10, decimal_places=2)
+    # Units on hand; empty means stock is not tracked for this product.
+    stock = models.PositiveIntegerField(null=True, blank=True)
     image = models.ImageField(upload_to='products/')
+    # Widths whose variants were built, recorded by generate_variants.
+    image_variant_widths = models.JSONField(default=list, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["category", "price", "id"], name="product_category_price_idx"
+            ),
+            models.Index(fields=["price", "id"], name="product_price_idx"),
+        ]
 
     def __str__(self):
         return self.title
\ No newline at end of file
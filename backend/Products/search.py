@@ -0,0 +1,123 @@
+import re
+
+from django.db import connection
+from rest_framework import filters
+
+from .models import ProductsModel
+
+
+PRODUCT_TABLE = ProductsModel._meta.db_table
+SEARCH_TABLE = f"{PRODUCT_TABLE}_fts"
+
+_TOKEN_RE = re.compile(r"\w", re.UNICODE)
+_fts5_available = None
+
+
+def fts5_available():
+    """FTS5 is only used on SQLite builds that ship it."""
+    global _fts5_available
+    if connection.vendor != "sqlite":
+        return False
+    if _fts5_available is None:
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA compile_options")
+            options = {row[0] for row in cursor.fetchall()}
+        _fts5_available = "ENABLE_FTS5" in options
+    return _fts5_available
+
+
+def search_index_exists():
+    return SEARCH_TABLE in connection.introspection.table_names()
+
+
+def create_search_index():
+    if not fts5_available():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS "{SEARCH_TABLE}" '
+            "USING fts5(title, description, "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+    return True
+
+
+def rebuild_search_index():
+    if not fts5_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS "{SEARCH_TABLE}"')
+        create_search_index()
+        cursor.execute(
+            f'INSERT INTO "{SEARCH_TABLE}" (rowid, title, description) '
+            f'SELECT id, title, description FROM "{PRODUCT_TABLE}"'
+        )
+        indexed = cursor.rowcount
+        cursor.execute(
+            f'INSERT INTO "{SEARCH_TABLE}" ("{SEARCH_TABLE}") VALUES (\'optimize\')'
+        )
+    return indexed
+
+
+def index_products(products):
+    if not fts5_available():
+        return
+    rows = [(p.id, p.title, p.description) for p in products]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM "{SEARCH_TABLE}" WHERE rowid = %s',
+            [(row[0],) for row in rows],
+        )
+        cursor.executemany(
+            f'INSERT INTO "{SEARCH_TABLE}" (rowid, title, description) '
+            "VALUES (%s, %s, %s)",
+            rows,
+        )
+
+
+def unindex_product(product_id):
+    if not fts5_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM "{SEARCH_TABLE}" WHERE rowid = %s', [product_id])
+
+
+def build_match_query(terms):
+    """
+    Every term is matched as a prefix and all of them must match,
+    the same AND semantics SearchFilter uses.
+    """
+    phrases = []
+    for term in terms:
+        if not _TOKEN_RE.search(term):
+            continue
+        phrases.append('"{}"*'.format(term.replace('"', '""')))
+    return " ".join(phrases)
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """
+    Runs ``?search=`` against the FTS5 index and orders results by bm25 rank.
+    Falls back to the plain SearchFilter when FTS5 is not available.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if not fts5_available():
+            return super().filter_queryset(request, queryset, view)
+
+        match = build_match_query(self.get_search_terms(request))
+        if not match:
+            return queryset
+
+        return queryset.extra(
+            tables=[SEARCH_TABLE],
+            where=[
+                f'"{SEARCH_TABLE}".rowid = "{PRODUCT_TABLE}"."id"',
+                f'"{SEARCH_TABLE}" MATCH %s',
+            ],
+            params=[match],
+            select={"search_rank": f'"{SEARCH_TABLE}".rank'},
+            order_by=["search_rank", "id"],
+        )
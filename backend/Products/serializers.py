@@ -1,5 +1,39 @@
 from rest_framework import serializers
 from .models import ProductCategoryModel, ProductsModel
+from .images import variant_urls
+
+
+# Model columns each product serializer field reads, used to trim the query.
+PRODUCT_FIELD_COLUMNS = {
+    'id': ['id'],
+    'title': ['title'],
+    'description': ['description'],
+    'category': ['category__id', 'category__name'],
+    'price': ['price'],
+    'image': ['image'],
+    'image_variants': ['image', 'image_variant_widths'],
+}
+
+
+def only_product_fields(queryset, field_names):
+    """Restricts a ProductsModel queryset to the columns the given fields need."""
+    columns = {'id'}
+    for name in field_names:
+        columns.update(PRODUCT_FIELD_COLUMNS.get(name, []))
+    if 'category' in field_names:
+        queryset = queryset.select_related('category')
+    return queryset.only(*columns)
+
+
+class SparseFieldsMixin:
+    """Accepts a ``fields`` argument and drops every other declared field."""
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
 
 
 class ProductCategorySerializer(serializers.ModelSerializer):
@@ -8,9 +42,22 @@ class ProductCategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name']
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     category = ProductCategorySerializer(read_only=True)
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = ProductsModel
-        fields = ['id', 'title', 'description', 'category', 'price', 'image']
+        fields = [
+            'id', 'title', 'description', 'category', 'price', 'image', 'image_variants'
+        ]
+
+    def get_image_variants(self, obj):
+        return variant_urls(obj.image, self.context.get("request"))
+
+
+class ProductListSerializer(ProductSerializer):
+    """Compact representation for list tiles and cart lines: no description."""
+
+    class Meta(ProductSerializer.Meta):
+        fields = ['id', 'title', 'category', 'price', 'image', 'image_variants']
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import schedule_catalog_version_bump
+from .images import generate_variants, image_changed, track_image_changes
+from .models import ProductCategoryModel, ProductsModel
+from .search import index_products, unindex_product
+from .snapshots import schedule_snapshot_rebuild
+
+
+track_image_changes(ProductsModel, "image")
+
+
+@receiver(post_save, sender=ProductsModel)
+def update_product_search_index(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    index_products([instance])
+
+
+@receiver(post_delete, sender=ProductsModel)
+def remove_product_search_index(sender, instance, **kwargs):
+    unindex_product(instance.pk)
+
+
+@receiver(post_save, sender=ProductsModel)
+@receiver(post_delete, sender=ProductsModel)
+@receiver(post_save, sender=ProductCategoryModel)
+@receiver(post_delete, sender=ProductCategoryModel)
+def invalidate_catalog_cache(sender, **kwargs):
+    schedule_catalog_version_bump()
+    if settings.CATALOG_SNAPSHOT_ON_CHANGE:
+        transaction.on_commit(schedule_snapshot_rebuild)
+
+
+@receiver(post_save, sender=ProductsModel)
+def build_product_image_variants(sender, instance, raw=False, **kwargs):
+    if raw or not image_changed(instance, "image"):
+        return
+    generate_variants(instance.image)
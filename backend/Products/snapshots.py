@@ -0,0 +1,207 @@
+import gzip
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.db import connection
+from rest_framework.utils.encoders import JSONEncoder
+
+from .cache import get_catalog_version
+from .models import ProductCategoryModel, ProductsModel
+from .serializers import ProductCategorySerializer, ProductSerializer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_ROOT = str(
+    getattr(settings, "CATALOG_SNAPSHOT_ROOT", settings.BASE_DIR / "snapshots")
+)
+SNAPSHOT_URL = getattr(settings, "CATALOG_SNAPSHOT_URL", "/snapshots/")
+SNAPSHOT_BASE_URL = getattr(settings, "CATALOG_SNAPSHOT_BASE_URL", "http://localhost")
+SNAPSHOT_PAGE_SIZE = getattr(settings, "CATALOG_SNAPSHOT_PAGE_SIZE", 100)
+SNAPSHOT_KEEP = getattr(settings, "CATALOG_SNAPSHOT_KEEP", 2)
+LATEST_NAME = "latest.json"
+
+
+class SnapshotRequest:
+    """
+    Stands in for the request in serializer context, so snapshot files carry
+    the same absolute image URLs as the live API, resolved against
+    ``CATALOG_SNAPSHOT_BASE_URL``.
+    """
+
+    def build_absolute_uri(self, location=None):
+        return urljoin(SNAPSHOT_BASE_URL, location or "/")
+
+
+snapshot_request = SnapshotRequest()
+
+
+def write_json(root, name, data):
+    """Writes ``name`` under ``root`` together with its .gz (and .br) copies."""
+    path = os.path.join(root, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    body = json.dumps(
+        data, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":")
+    ).encode()
+    with open(path, "wb") as f:
+        f.write(body)
+    with open(path + ".gz", "wb") as f:
+        f.write(gzip.compress(body, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + ".br", "wb") as f:
+            f.write(brotli.compress(body))
+
+
+def write_product_pages(root, prefix, queryset):
+    """
+    Streams ``queryset`` into ``<prefix>/page-<n>.json`` files shaped like the
+    page-number API response, with ``next``/``previous`` linking the files.
+    Returns the number of pages written.
+    """
+    url_prefix = snapshot_request.build_absolute_uri(
+        f"{SNAPSHOT_URL}{os.path.basename(root)}/{prefix}"
+    )
+    count = queryset.count()
+    pages = max(1, -(-count // SNAPSHOT_PAGE_SIZE))
+
+    def page_url(number):
+        return f"{url_prefix}/page-{number}.json" if 1 <= number <= pages else None
+
+    page, number = [], 1
+    rows = queryset.select_related("category").order_by("id").iterator(chunk_size=2000)
+    for product in rows:
+        page.append(product)
+        if len(page) < SNAPSHOT_PAGE_SIZE:
+            continue
+        write_product_page(root, prefix, number, page, count, page_url)
+        page, number = [], number + 1
+    if page or number == 1:
+        write_product_page(root, prefix, number, page, count, page_url)
+    return pages
+
+
+def write_product_page(root, prefix, number, products, count, page_url):
+    write_json(root, f"{prefix}/page-{number}.json", {
+        "count": count,
+        "next": page_url(number + 1),
+        "previous": page_url(number - 1),
+        "results": ProductSerializer(
+            products, many=True, context={"request": snapshot_request}
+        ).data,
+    })
+
+
+def build_snapshot():
+    """
+    Renders the category list and every category's product pages into
+    ``SNAPSHOT_ROOT/<catalog version>/`` and points ``latest.json`` at it.
+    The version directory is built aside and renamed into place, so readers
+    never see a half written snapshot. Returns the version.
+    """
+    version = str(get_catalog_version())
+    target = os.path.join(SNAPSHOT_ROOT, version)
+    if os.path.isdir(target):
+        return version
+
+    os.makedirs(SNAPSHOT_ROOT, exist_ok=True)
+    build_root = tempfile.mkdtemp(prefix=f".{version}-", dir=SNAPSHOT_ROOT)
+    try:
+        root = os.path.join(build_root, version)
+        categories = list(ProductCategoryModel.objects.order_by("id"))
+        write_json(
+            root,
+            "categories.json",
+            ProductCategorySerializer(categories, many=True).data,
+        )
+        write_product_pages(root, "products", ProductsModel.objects.all())
+        for category in categories:
+            write_product_pages(
+                root,
+                f"categories/{category.id}",
+                ProductsModel.objects.filter(category_id=category.id),
+            )
+        try:
+            os.replace(root, target)
+        except OSError:
+            # Another worker published the same version first.
+            if not os.path.isdir(target):
+                raise
+    finally:
+        shutil.rmtree(build_root, ignore_errors=True)
+
+    write_latest(version)
+    prune_snapshots(keep=SNAPSHOT_KEEP)
+    return version
+
+
+def write_latest(version):
+    build_root = tempfile.mkdtemp(prefix=".latest-", dir=SNAPSHOT_ROOT)
+    try:
+        base = snapshot_request.build_absolute_uri(f"{SNAPSHOT_URL}{version}/")
+        write_json(build_root, LATEST_NAME, {
+            "version": version,
+            "categories": f"{base}categories.json",
+            "products": f"{base}products/page-1.json",
+            "category_products": f"{base}categories/{{id}}/page-1.json",
+        })
+        for suffix in ("", ".gz", ".br"):
+            source = os.path.join(build_root, LATEST_NAME + suffix)
+            if os.path.exists(source):
+                os.replace(source, os.path.join(SNAPSHOT_ROOT, LATEST_NAME + suffix))
+    finally:
+        shutil.rmtree(build_root, ignore_errors=True)
+
+
+def prune_snapshots(keep):
+    versions = sorted(
+        (name for name in os.listdir(SNAPSHOT_ROOT) if name.isdigit()),
+        key=int,
+        reverse=True,
+    )
+    for name in versions[keep:]:
+        shutil.rmtree(os.path.join(SNAPSHOT_ROOT, name), ignore_errors=True)
+    return versions[keep:]
+
+
+_rebuild_lock = threading.Lock()
+_rebuild_state = {"running": False, "pending": False}
+
+
+def schedule_snapshot_rebuild():
+    """
+    Rebuilds the snapshot in a background thread. Changes that arrive while
+    a build runs are coalesced into one more build after it.
+    """
+    with _rebuild_lock:
+        if _rebuild_state["running"]:
+            _rebuild_state["pending"] = True
+            return
+        _rebuild_state["running"] = True
+    threading.Thread(target=_rebuild_loop, daemon=True).start()
+
+
+def _rebuild_loop():
+    try:
+        while True:
+            try:
+                build_snapshot()
+            except Exception:
+                logger.exception("Catalog snapshot build failed")
+            with _rebuild_lock:
+                if not _rebuild_state["pending"]:
+                    _rebuild_state["running"] = False
+                    return
+                _rebuild_state["pending"] = False
+    finally:
+        connection.close()
@@ -1,3 +1,625 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+import time
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from User.models import UserModel
+from .cache import get_catalog_version
+from .images import variant_urls
+from .models import ProductCategoryModel, ProductsModel
+from .snapshots import build_snapshot
+from .search import ProductSearchFilter, fts5_available
+from .views import ProductListView
+
+
+PRODUCTS_URL = "/api/v1/category/products/"
+
+
+def make_user(email):
+    return UserModel.objects.create(email=email, password="Secret-pass1")
+
+
+def auth_client(user):
+    refresh = RefreshToken.for_user(user)
+    refresh["id"] = user.id
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+    return client
+
+
+def isolate_catalog_version(testcase):
+    """Gives ``testcase`` an empty catalog version store of its own."""
+    directory = tempfile.TemporaryDirectory()
+    testcase.addCleanup(directory.cleanup)
+    settings_override = override_settings(CACHES={
+        **settings.CACHES,
+        "catalog_version": {
+            **settings.CACHES["catalog_version"],
+            "LOCATION": directory.name,
+        },
+    })
+    settings_override.enable()
+    testcase.addCleanup(settings_override.disable)
+
+
+def search(term):
+    request = Request(APIRequestFactory().get(PRODUCTS_URL, {"search": term}))
+    queryset = ProductsModel.objects.order_by("id")
+    view = ProductListView()
+    results = ProductSearchFilter().filter_queryset(request, queryset, view)
+    return [product.title for product in results]
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        caches["catalog"].clear()
+        ProductsModel.objects.create(
+            title="Desk lamp",
+            description="Adjustable arm, warm light, metal base and a long cable",
+        )
+        ProductsModel.objects.create(title="Lamp", description="")
+        ProductsModel.objects.create(title="Red chair", description="Soft seat")
+
+    def test_fts5_is_used_here(self):
+        self.assertTrue(fts5_available())
+
+    def test_results_are_ranked_by_bm25(self):
+        self.assertEqual(search("lamp"), ["Lamp", "Desk lamp"])
+
+    def test_terms_match_as_prefixes_and_all_must_match(self):
+        self.assertEqual(search("lam"), ["Lamp", "Desk lamp"])
+        self.assertEqual(search("desk la"), ["Desk lamp"])
+        self.assertEqual(search("soft cha"), ["Red chair"])
+        self.assertEqual(search("lamp chair"), [])
+
+    def test_punctuation_only_terms_are_ignored(self):
+        self.assertEqual(len(search('"*')), 3)
+
+    def test_index_follows_saves_and_deletes(self):
+        chair = ProductsModel.objects.get(title="Red chair")
+        chair.title = "Blue stool"
+        chair.save()
+        self.assertEqual(search("stool"), ["Blue stool"])
+        self.assertEqual(search("red"), [])
+
+        chair.delete()
+        self.assertEqual(search("stool"), [])
+
+    def test_rebuild_command_restores_the_index(self):
+        ProductsModel.objects.bulk_create([ProductsModel(title="Floor lamp")])
+        self.assertEqual(search("floor"), [])
+
+        call_command("rebuild_search_index", stdout=StringIO())
+
+        self.assertEqual(search("floor"), ["Floor lamp"])
+
+    def test_search_through_the_api(self):
+        user = make_user("shopper@example.com")
+        response = auth_client(user).get(PRODUCTS_URL, {"search": "lamp"})
+
+        self.assertEqual(response.status_code, 200)
+        titles = [product["title"] for product in response.data["results"]]
+        self.assertEqual(titles, ["Lamp", "Desk lamp"])
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        caches["catalog"].clear()
+        isolate_catalog_version(self)
+        self.client = auth_client(make_user("viewer@example.com"))
+        self.lamp = ProductsModel.objects.create(title="Lamp")
+        ProductsModel.objects.create(title="Chair")
+        self.first = self.client.get(PRODUCTS_URL)
+
+    def later(self):
+        return mock.patch(
+            "Products.cache.time.time_ns", return_value=time.time_ns() + 10**10
+        )
+
+    def test_unchanged_list_is_not_modified(self):
+        response = self.client.get(
+            PRODUCTS_URL, HTTP_IF_MODIFIED_SINCE=self.first["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_deletion_moves_last_modified_forward(self):
+        with self.later(), self.captureOnCommitCallbacks(execute=True):
+            self.lamp.delete()
+
+        response = self.client.get(
+            PRODUCTS_URL, HTTP_IF_MODIFIED_SINCE=self.first["Last-Modified"]
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p["title"] for p in response.data["results"]], ["Chair"])
+
+    def test_if_none_match_takes_precedence(self):
+        response = self.client.get(
+            PRODUCTS_URL,
+            HTTP_IF_NONE_MATCH='"stale"',
+            HTTP_IF_MODIFIED_SINCE=self.first["Last-Modified"],
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(PRODUCTS_URL, HTTP_IF_NONE_MATCH=self.first["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+
+def png(width=800, height=600):
+    buffer = BytesIO()
+    Image.new("RGB", (width, height), (200, 40, 40)).save(buffer, "PNG")
+    return ContentFile(buffer.getvalue(), name="photo.png")
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_variants_are_built_only_when_the_image_changes(self):
+        with mock.patch(
+            "Products.signals.generate_variants", return_value=0
+        ) as generate:
+            product = ProductsModel.objects.create(title="Lamp", image=png())
+            product.title = "Desk lamp"
+            product.save()
+            ProductsModel.objects.get(pk=product.pk).save()
+            self.assertEqual(generate.call_count, 1)
+
+            product.image = png()
+            product.save()
+            self.assertEqual(generate.call_count, 2)
+
+    def test_variants_are_never_wider_than_the_original(self):
+        product = ProductsModel.objects.create(title="Lamp", image=png(width=320))
+        self.assertEqual(list(variant_urls(product.image)), ["160"])
+
+    def test_urls_are_listed_only_for_written_variants(self):
+        product = ProductsModel.objects.create(title="Lamp", image=png())
+        urls = variant_urls(product.image)
+        self.assertEqual(sorted(urls, key=int), ["160", "320", "640"])
+        self.assertEqual(sorted(urls["160"]), ["jpeg", "webp"])
+
+        product.image = ContentFile(b"not an image", name="broken.png")
+        product.save()
+        self.assertEqual(variant_urls(product.image), {})
+        self.assertEqual(ProductsModel.objects.get().image_variant_widths, [])
+
+    def test_urls_come_from_the_recorded_widths_without_storage_calls(self):
+        product = ProductsModel.objects.create(title="Lamp", image=png())
+        self.assertEqual(
+            ProductsModel.objects.get().image_variant_widths, [160, 320, 640]
+        )
+
+        with mock.patch(
+            "django.core.files.storage.FileSystemStorage.exists",
+            side_effect=AssertionError("storage was asked"),
+        ):
+            product = ProductsModel.objects.get()
+            urls = variant_urls(product.image)
+        self.assertEqual(sorted(urls, key=int), ["160", "320", "640"])
+
+    def test_build_command_records_widths_of_existing_variants(self):
+        product = ProductsModel.objects.create(title="Lamp", image=png())
+        ProductsModel.objects.update(image_variant_widths=[])
+
+        call_command("build_image_variants", stdout=StringIO())
+
+        product.refresh_from_db()
+        self.assertEqual(product.image_variant_widths, [160, 320, 640])
+
+
+class ProductFacetTests(TestCase):
+    def setUp(self):
+        caches["catalog"].clear()
+        self.client = auth_client(make_user("facets@example.com"))
+        self.lights = ProductCategoryModel.objects.create(name="Lights")
+        self.seats = ProductCategoryModel.objects.create(name="Seats")
+        for title, price, category in [
+            ("Desk lamp", 30, self.lights),
+            ("Floor lamp", 120, self.lights),
+            ("Lamp shade", 60, self.lights),
+            ("Chair", 80, self.seats),
+            ("Sofa", 700, self.seats),
+        ]:
+            ProductsModel.objects.create(title=title, price=price, category=category)
+
+    def facets(self, **params):
+        response = self.client.get(PRODUCTS_URL, {"facets": "1", **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data["facets"]
+
+    def bucket_counts(self, facets):
+        return [bucket["count"] for bucket in facets["price"]["buckets"]]
+
+    def test_category_counts_and_price_buckets(self):
+        facets = self.facets()
+
+        self.assertEqual(facets["categories"], [
+            {"id": self.lights.id, "name": "Lights", "count": 3},
+            {"id": self.seats.id, "name": "Seats", "count": 2},
+        ])
+        self.assertEqual(self.bucket_counts(facets), [1, 2, 1, 0, 1, 0])
+        self.assertEqual(facets["price"]["min"], "30.00")
+        self.assertEqual(facets["price"]["max"], "700.00")
+
+    def test_each_facet_ignores_its_own_filter(self):
+        facets = self.facets(categoryId=self.seats.id, maxPrice="100")
+
+        self.assertEqual(
+            [category["count"] for category in facets["categories"]], [2, 1]
+        )
+        self.assertEqual(self.bucket_counts(facets), [0, 1, 0, 0, 1, 0])
+
+    def test_facets_follow_the_search(self):
+        facets = self.facets(search="lamp")
+
+        self.assertEqual(facets["categories"], [
+            {"id": self.lights.id, "name": "Lights", "count": 3},
+        ])
+        self.assertEqual(self.bucket_counts(facets), [1, 1, 1, 0, 0, 0])
+
+    def test_non_finite_prices_are_rejected(self):
+        for value in ("NaN", "sNaN", "Infinity", "-inf", "abc"):
+            response = self.client.get(PRODUCTS_URL, {"minPrice": value})
+            self.assertEqual(response.status_code, 400, value)
+            self.assertIn("minPrice", response.data)
+
+
+@override_settings(CATALOG_SNAPSHOT_ON_CHANGE=False)
+class CatalogSnapshotTests(TestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = root.name
+        for target in (
+            "Products.snapshots.SNAPSHOT_ROOT",
+            "Products.middleware.SNAPSHOT_ROOT",
+        ):
+            patcher = mock.patch(target, self.root)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch(
+            "Products.snapshots.SNAPSHOT_BASE_URL", "https://shop.example.com"
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        isolate_catalog_version(self)
+        category = ProductCategoryModel.objects.create(name="Lights")
+        ProductsModel.objects.create(
+            title="Lamp", price=10, category=category, image="products/lamp.png"
+        )
+        ProductsModel.objects.create(title="Chair", price=20)
+        self.category = category
+
+    def read(self, version, name):
+        with open(os.path.join(self.root, version, name), "rb") as f:
+            return json.loads(f.read())
+
+    def test_build_writes_pages_with_absolute_links(self):
+        version = build_snapshot()
+
+        categories = self.read(version, "categories.json")
+        self.assertEqual(categories, [{"id": self.category.id, "name": "Lights"}])
+
+        page = self.read(version, "products/page-1.json")
+        self.assertEqual(page["count"], 2)
+        self.assertIsNone(page["next"])
+        self.assertEqual(
+            page["results"][0]["image"],
+            "https://shop.example.com/media/products/lamp.png",
+        )
+
+        page = self.read(version, f"categories/{self.category.id}/page-1.json")
+        self.assertEqual([p["title"] for p in page["results"]], ["Lamp"])
+
+        with open(os.path.join(self.root, "latest.json")) as f:
+            latest = json.load(f)
+        self.assertEqual(latest["version"], version)
+        self.assertEqual(
+            latest["products"],
+            f"https://shop.example.com/snapshots/{version}/products/page-1.json",
+        )
+
+        gz = os.path.join(self.root, version, "products/page-1.json.gz")
+        with open(gz, "rb") as f:
+            self.assertEqual(
+                json.loads(gzip.decompress(f.read())),
+                self.read(version, "products/page-1.json"),
+            )
+
+    def test_middleware_serves_published_snapshots(self):
+        client = Client()
+        self.assertEqual(client.get("/snapshots/latest.json").status_code, 404)
+
+        version = build_snapshot()
+
+        response = client.get(f"/snapshots/{version}/products/page-1.json")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("immutable", response["Cache-Control"])
+        body = b"".join(response.streaming_content)
+        self.assertEqual(json.loads(body)["count"], 2)
+
+        response = client.get(
+            f"/snapshots/{version}/categories.json", HTTP_ACCEPT_ENCODING="gzip"
+        )
+        # The .gz copy is only picked when it is smaller than the plain file.
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+        response = client.get("/snapshots/latest.json")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("immutable", response["Cache-Control"])
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        caches["catalog"].clear()
+        self.client = auth_client(make_user("cursor@example.com"))
+        for number in range(25):
+            ProductsModel.objects.create(title=f"Lamp {number}", price=100 - number)
+
+    def walk(self, **params):
+        titles, pages = [], 0
+        response = self.client.get(PRODUCTS_URL, {"pagination": "cursor", **params})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("count", response.data)
+            titles += [product["title"] for product in response.data["results"]]
+            pages += 1
+            if not response.data["next"]:
+                return titles, pages
+            response = self.client.get(response.data["next"])
+
+    def test_pages_cover_every_product_once_in_id_order(self):
+        titles, pages = self.walk()
+        self.assertEqual(pages, 3)
+        self.assertEqual(titles, [f"Lamp {number}" for number in range(25)])
+
+    def test_no_count_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(PRODUCTS_URL, {"pagination": "cursor"})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(
+            [q["sql"] for q in queries if "COUNT(" in q["sql"].upper()]
+        )
+
+    def test_ordering_is_kept_across_pages(self):
+        titles, _ = self.walk(ordering="price")
+        self.assertEqual(titles, [f"Lamp {number}" for number in reversed(range(25))])
+
+    def test_search_cannot_use_cursor_pages(self):
+        response = self.client.get(
+            PRODUCTS_URL, {"pagination": "cursor", "search": "lamp"}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("cursor", response.data)
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        caches["catalog"].clear()
+        isolate_catalog_version(self)
+        self.client = auth_client(make_user("cache@example.com"))
+        self.category = ProductCategoryModel.objects.create(name="Lights")
+        self.lamp = ProductsModel.objects.create(title="Lamp", category=self.category)
+
+    def titles(self):
+        response = self.client.get(PRODUCTS_URL)
+        self.assertEqual(response.status_code, 200)
+        return [product["title"] for product in response.data["results"]]
+
+    def test_cache_hit_runs_no_queries(self):
+        first = self.client.get(PRODUCTS_URL)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(PRODUCTS_URL)
+
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_committed_product_change_bumps_the_version(self):
+        self.assertEqual(self.titles(), ["Lamp"])
+        version = get_catalog_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lamp.title = "Desk lamp"
+            self.lamp.save()
+
+        self.assertNotEqual(get_catalog_version(), version)
+        self.assertEqual(self.titles(), ["Desk lamp"])
+
+    def test_committed_category_change_bumps_the_version(self):
+        response = self.client.get(PRODUCTS_URL)
+        self.assertEqual(response.data["results"][0]["category"]["name"], "Lights")
+        version = get_catalog_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = "Lamps"
+            self.category.save()
+
+        self.assertNotEqual(get_catalog_version(), version)
+        response = self.client.get(PRODUCTS_URL)
+        self.assertEqual(response.data["results"][0]["category"]["name"], "Lamps")
+
+    def test_uncommitted_change_keeps_the_cached_response(self):
+        self.assertEqual(self.titles(), ["Lamp"])
+        version = get_catalog_version()
+
+        with self.captureOnCommitCallbacks(execute=False):
+            self.lamp.title = "Desk lamp"
+            self.lamp.save()
+
+        self.assertEqual(get_catalog_version(), version)
+        self.assertEqual(self.titles(), ["Lamp"])
+
+
+class ImportCatalogTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def run_import(self, name, lines):
+        path = os.path.join(self.directory, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        out, err = StringIO(), StringIO()
+        with mock.patch(
+            "Products.management.commands.import_catalog.bump_catalog_version"
+        ) as bump:
+            call_command(
+                "import_catalog", path, "--batch-size", "2", stdout=out, stderr=err
+            )
+        return bump, out.getvalue(), err.getvalue()
+
+    def test_rows_are_upserted_by_sku(self):
+        bump, out, _ = self.run_import("first.jsonl", [
+            json.dumps(
+                {"sku": "L1", "title": "Lamp", "price": "10", "category": "Lights"}
+            ),
+            json.dumps({"sku": "C1", "title": "Chair", "price": "20"}),
+            json.dumps({"title": "No sku"}),
+        ])
+        self.assertIn("Created 3, updated 0, skipped 0", out)
+        bump.assert_called_once_with()
+
+        bump, out, _ = self.run_import("second.jsonl", [
+            json.dumps({"sku": "L1", "title": "Desk lamp", "price": "12.50"}),
+            json.dumps({"sku": "S1", "title": "Sofa", "price": "300"}),
+        ])
+        self.assertIn("Created 1, updated 1, skipped 0", out)
+        bump.assert_called_once_with()
+
+        lamp = ProductsModel.objects.get(sku="L1")
+        self.assertEqual((lamp.title, str(lamp.price)), ("Desk lamp", "12.50"))
+        self.assertEqual(ProductsModel.objects.count(), 4)
+        self.assertEqual(search("desk"), ["Desk lamp"])
+
+    def test_bad_rows_are_skipped_with_a_warning(self):
+        bump, out, err = self.run_import("bad.jsonl", [
+            "[1, 2]",
+            "42",
+            "{not json",
+            json.dumps({"sku": "X", "price": "cheap"}),
+            json.dumps({"sku": "L1", "title": "Lamp"}),
+        ])
+
+        self.assertIn("Created 1, updated 0, skipped 4", out)
+        self.assertIn("line 1: expected an object, got list, skipped", err)
+        self.assertIn("line 2: expected an object, got int, skipped", err)
+        self.assertIn("line 3: invalid JSON", err)
+        self.assertIn("line 4: invalid price 'cheap', skipped", err)
+        skus = ProductsModel.objects.values_list("sku", flat=True)
+        self.assertEqual(list(skus), ["L1"])
+        bump.assert_called_once_with()
+
+    def test_nothing_imported_does_not_bump_the_version(self):
+        bump, out, _ = self.run_import("empty.jsonl", ["[]"])
+        self.assertIn("Created 0, updated 0, skipped 1", out)
+        bump.assert_not_called()
+
+
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        caches["catalog"].clear()
+        self.client = auth_client(make_user("fields@example.com"))
+        category = ProductCategoryModel.objects.create(name="Lights")
+        ProductsModel.objects.create(
+            title="Lamp", description="Warm light", price=10, category=category
+        )
+
+    def get(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(PRODUCTS_URL, params)
+        self.assertEqual(response.status_code, 200)
+        page_sql = [
+            q["sql"] for q in queries
+            if "FROM \"Products_productsmodel\"" in q["sql"] and "LIMIT" in q["sql"]
+        ]
+        self.assertEqual(len(page_sql), 1)
+        return response.data["results"][0], page_sql[0]
+
+    def test_fields_limits_keys_and_columns(self):
+        product, sql = self.get(fields="id,title,price")
+
+        self.assertEqual(set(product), {"id", "title", "price"})
+        self.assertIn('"title"', sql)
+        self.assertIn('"price"', sql)
+        self.assertNotIn('"description"', sql)
+        self.assertNotIn('"image"', sql)
+        self.assertNotIn("JOIN", sql)
+
+    def test_unknown_fields_fall_back_to_all_fields(self):
+        product, _ = self.get(fields="nope")
+        self.assertIn("description", product)
+
+    def test_compact_drops_the_description(self):
+        product, sql = self.get(compact="1")
+
+        self.assertEqual(
+            set(product),
+            {"id", "title", "category", "price", "image", "image_variants"},
+        )
+        self.assertEqual(product["category"]["name"], "Lights")
+        self.assertNotIn('"description"', sql)
+        self.assertIn("JOIN", sql)
+
+
+class ProductBatchTests(TestCase):
+    url = "/api/v1/category/products/batch/"
+
+    def setUp(self):
+        self.client = auth_client(make_user("batch@example.com"))
+        self.products = [
+            ProductsModel.objects.create(title=title) for title in ("A", "B", "C")
+        ]
+
+    def get(self, ids):
+        return self.client.get(self.url, {"ids": ids})
+
+    def test_request_order_is_kept_and_duplicates_collapse(self):
+        a, b, c = (product.id for product in self.products)
+
+        response = self.get(f"{c},{a},{c},{b},{a}")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p["id"] for p in response.data["results"]], [c, a, b])
+        self.assertEqual(response.data["missing"], [])
+
+    def test_unknown_ids_are_reported_as_missing(self):
+        a = self.products[0].id
+
+        response = self.get(f"999,{a},998")
+
+        self.assertEqual([p["title"] for p in response.data["results"]], ["A"])
+        self.assertEqual(response.data["missing"], [999, 998])
+
+    def test_invalid_ids_are_rejected(self):
+        for ids in ("1,two", "", ","):
+            self.assertEqual(self.get(ids).status_code, 400, ids)
+
+    @mock.patch("Products.views.ProductBatchView.max_ids", 3)
+    def test_too_many_ids_are_rejected(self):
+        self.assertEqual(self.get("1,2,3").status_code, 200)
+        response = self.get("1,2,3,4")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("At most 3", response.data["error"])
@@ -1,8 +1,9 @@
 from django.urls import path
-from .views import AllCategoryView, ProductListView, ProductDetailView
+from .views import AllCategoryView, ProductListView, ProductDetailView, ProductBatchView
 
 urlpatterns = [
     path('categories/', AllCategoryView.as_view(), name='categories'),
     path('products/', ProductListView.as_view(), name='products'),
+    path('products/batch/', ProductBatchView.as_view(), name='product-batch'),
     path('products/<int:pk>/', ProductDetailView.as_view(), name='product-detail'),
 ]
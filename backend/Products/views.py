@@ -1,10 +1,22 @@
+from django.conf import settings
 from rest_framework.generics import ListAPIView, RetrieveAPIView
-from rest_framework import filters, permissions
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from .models import ProductCategoryModel, ProductsModel
-from .serializers import ProductCategorySerializer, ProductSerializer
+from .serializers import (
+    ProductCategorySerializer,
+    ProductListSerializer,
+    ProductSerializer,
+    only_product_fields,
+)
+from .search import ProductSearchFilter
+from .facets import CatalogFilters, product_facets
+from .cache import CatalogCacheMixin
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from User.authentication import CustomUserJWTAuthentication
 
@@ -14,7 +26,22 @@ class ProductPagination(PageNumberPagination):
     page_query_param = "page"
 
 
-class AllCategoryView(ListAPIView):
+class ProductCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the primary key: no COUNT(*) and no OFFSET scan,
+    so deep pages cost the same as the first one.
+    """
+    page_size = 10
+    cursor_query_param = "cursor"
+    ordering = "id"
+
+    def get_ordering(self, request, queryset, view):
+        if hasattr(view, "get_catalog_filters") and view.get_catalog_filters().ordering:
+            return view.get_catalog_filters().ordering
+        return super().get_ordering(request, queryset, view)
+
+
+class AllCategoryView(CatalogCacheMixin, ListAPIView):
     queryset = ProductCategoryModel.objects.all()
     serializer_class = ProductCategorySerializer
     authentication_classes = [CustomUserJWTAuthentication]
@@ -29,18 +56,78 @@ class AllCategoryView(ListAPIView):
         return super().get(*args, **kwargs)
 
 
-class ProductListView(ListAPIView):
+class ProductListView(CatalogCacheMixin, ListAPIView):
     serializer_class = ProductSerializer
     pagination_class = ProductPagination
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [ProductSearchFilter]
+    cursor_pagination_class = ProductCursorPagination
+    last_modified_fields = ("updated_at", "category__updated_at")
     search_fields = ['title', 'description']
     authentication_classes = [CustomUserJWTAuthentication]
 
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            params = self.request.query_params
+            if params.get("pagination") == "cursor" or "cursor" in params:
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_serializer_class(self):
+        if self.request.query_params.get("compact") in ("1", "true"):
+            return ProductListSerializer
+        return ProductSerializer
+
+    def get_field_names(self):
+        field_names = list(self.get_serializer_class().Meta.fields)
+        requested = self.request.query_params.get("fields")
+        if requested:
+            requested = {name.strip() for name in requested.split(",")}
+            selected = [name for name in field_names if name in requested]
+            field_names = selected or field_names
+        return field_names
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault("fields", self.get_field_names())
+        return super().get_serializer(*args, **kwargs)
+
+    def get_catalog_filters(self):
+        if not hasattr(self, "_catalog_filters"):
+            self._catalog_filters = CatalogFilters(self.request.query_params)
+        return self._catalog_filters
+
     def get_queryset(self):
-        category_id = self.request.GET.get("categoryId")
-        if category_id:
-            return ProductsModel.objects.filter(category_id=category_id)
-        return ProductsModel.objects.all()
+        queryset = only_product_fields(
+            ProductsModel.objects.order_by("id"), self.get_field_names()
+        )
+        return self.get_catalog_filters().apply(queryset)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        # An explicit sort beats the search rank.
+        ordering = self.get_catalog_filters().ordering
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        # Keyset pages are ordered by id (or ?ordering=), which would silently
+        # replace the search rank, so the two are not combined.
+        if isinstance(self.paginator, CursorPagination) and request.query_params.get(
+            ProductSearchFilter.search_param
+        ):
+            raise ValidationError({
+                "cursor": "Cursor pagination cannot be combined with search, use ?page="
+            })
+        response = super().list(request, *args, **kwargs)
+        if request.query_params.get("facets") in ("1", "true"):
+            response.data["facets"] = product_facets(
+                self.filter_queryset(ProductsModel.objects.all()),
+                self.get_catalog_filters(),
+            )
+        return response
 
     @swagger_auto_schema(
         tags=["Products"],
@@ -50,8 +137,35 @@ class ProductListView(ListAPIView):
             openapi.Parameter(
                 'categoryId',
                 openapi.IN_QUERY,
-                type=openapi.TYPE_INTEGER,
-                description="Category bo‘yicha filter"
+                type=openapi.TYPE_STRING,
+                description=(
+                    "Category bo‘yicha filter, bir nechta bo'lsa vergul bilan: 1,2,5"
+                ),
+            ),
+            openapi.Parameter(
+                'minPrice',
+                openapi.IN_QUERY,
+                type=openapi.TYPE_NUMBER,
+                description="Minimal narx"
+            ),
+            openapi.Parameter(
+                'maxPrice',
+                openapi.IN_QUERY,
+                type=openapi.TYPE_NUMBER,
+                description="Maksimal narx"
+            ),
+            openapi.Parameter(
+                'ordering',
+                openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                enum=['price', '-price'],
+                description="Narx bo'yicha saralash"
+            ),
+            openapi.Parameter(
+                'facets',
+                openapi.IN_QUERY,
+                type=openapi.TYPE_BOOLEAN,
+                description="Kategoriya va narx oraliqlari bo'yicha sonlarni qaytaradi"
             ),
             openapi.Parameter(
                 'search',
@@ -59,12 +173,40 @@ class ProductListView(ListAPIView):
                 type=openapi.TYPE_STRING,
                 description="Search (title, description)"
             ),
+            openapi.Parameter(
+                'fields',
+                openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                description="Faqat kerakli maydonlar, masalan: id,title,price,image"
+            ),
+            openapi.Parameter(
+                'compact',
+                openapi.IN_QUERY,
+                type=openapi.TYPE_BOOLEAN,
+                description="description siz ixcham ro'yxat"
+            ),
             openapi.Parameter(
                 'page',
                 openapi.IN_QUERY,
                 type=openapi.TYPE_INTEGER,
                 description="Pagination uchun page raqami"
             ),
+            openapi.Parameter(
+                'pagination',
+                openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                enum=['page', 'cursor'],
+                description=(
+                    "cursor - COUNT siz keyset pagination, keyingi sahifa `next` "
+                    "havolasida. `search` bilan birga ishlatib bo'lmaydi (400)"
+                ),
+            ),
+            openapi.Parameter(
+                'cursor',
+                openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                description="Cursor rejimida `next`/`previous` dan olingan qiymat"
+            ),
         ],
         responses={200: ProductSerializer(many=True)},
     )
@@ -72,10 +214,11 @@ class ProductListView(ListAPIView):
         return super().get(*args, **kwargs)
 
 
-class ProductDetailView(RetrieveAPIView):
-    queryset = ProductsModel.objects.all()
+class ProductDetailView(CatalogCacheMixin, RetrieveAPIView):
+    queryset = ProductsModel.objects.select_related("category")
     serializer_class = ProductSerializer
     lookup_field = "pk"
+    last_modified_fields = ("updated_at", "category__updated_at")
     authentication_classes = [CustomUserJWTAuthentication]
 
     @swagger_auto_schema(
@@ -88,3 +231,66 @@ class ProductDetailView(RetrieveAPIView):
     )
     def get(self, *args, **kwargs):
         return super().get(*args, **kwargs)
+
+
+class ProductBatchView(APIView):
+    authentication_classes = [CustomUserJWTAuthentication]
+    max_ids = getattr(settings, "PRODUCT_BATCH_MAX_IDS", 100)
+
+    @swagger_auto_schema(
+        tags=["Products"],
+        operation_summary="Bir nechta mahsulotni ID lar bo‘yicha olish",
+        operation_description=(
+            "Wishlist, savat va deep link lar uchun: bitta so‘rovda bir nechta "
+            "mahsulot. Natija so‘ralgan tartibda, topilmagan ID lar `missing` da "
+            "qaytadi."
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                'ids',
+                openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                required=True,
+                description="Vergul bilan ajratilgan ID lar, masalan: 3,1,7"
+            ),
+        ],
+        responses={
+            200: openapi.Response(
+                description="Products found",
+                examples={"application/json": {"results": [], "missing": [7]}},
+            ),
+            400: "Invalid or too many ids",
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        parts = request.query_params.get("ids", "").split(",")
+        try:
+            ids = [int(part) for part in parts if part.strip()]
+        except ValueError:
+            return Response(
+                {"error": "ids must be a comma separated list of integers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return Response(
+                {"error": "ids is required"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(ids) > self.max_ids:
+            return Response(
+                {"error": f"At most {self.max_ids} ids per request"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        products = ProductsModel.objects.select_related("category").in_bulk(ids)
+        serializer = ProductSerializer(
+            [products[pk] for pk in ids if pk in products],
+            many=True,
+            context={"request": request},
+        )
+        missing = [pk for pk in ids if pk not in products]
+        return Response(
+            {"results": serializer.data, "missing": missing},
+            status=status.HTTP_200_OK,
+        )
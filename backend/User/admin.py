@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserModel, OTP
+from .models import UserModel, OTP, EmailOutboxModel, RevokedTokenModel
 
 
 @admin.register(UserModel)
@@ -14,3 +14,20 @@ class UserModelAdmin(admin.ModelAdmin):
 
 
 admin.site.register(OTP)
+
+
+@admin.register(EmailOutboxModel)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = (
+        "id", "to", "subject", "status", "attempts", "next_attempt_at", "sent_at"
+    )
+    list_filter = ("status",)
+    search_fields = ("to",)
+    readonly_fields = ("last_error",)
+
+
+@admin.register(RevokedTokenModel)
+class RevokedTokenAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "jti", "issued_before", "expires_at", "created_at")
+    list_select_related = ("user",)
+    search_fields = ("jti", "user__email")
@@ -1,9 +1,64 @@
+from django.core.cache import caches
 from rest_framework.authentication import BaseAuthentication
 from rest_framework import exceptions
 from rest_framework_simplejwt.tokens import UntypedToken, TokenError
 from rest_framework_simplejwt.exceptions import InvalidToken
 
 from .models import UserModel
+from .revocation import revocations
+
+
+user_cache = caches["users"]
+profile_versions = caches["profile_versions"]
+
+
+def user_cache_key(user_id):
+    return f"user:{user_id}"
+
+
+def get_cached_user(user_id):
+    """
+    Authenticated users by id, kept for the "users" cache TIMEOUT. Saves and
+    deletes drop the entry (see signals), the TTL bounds how long another
+    worker can serve a stale copy.
+    """
+    key = user_cache_key(user_id)
+    user = user_cache.get(key)
+    if user is None:
+        user = UserModel.objects.get(id=user_id)
+        user_cache.set(key, user)
+    return user
+
+
+def forget_user(user_id):
+    user_cache.delete(user_cache_key(user_id))
+
+
+def profile_version_key(user_id):
+    return f"profile_version:{user_id}"
+
+
+def get_profile_version(user_id):
+    """Current profile version of the user, or None if the user is gone."""
+    key = profile_version_key(user_id)
+    version = profile_versions.get(key)
+    if version is None:
+        version = (
+            UserModel.objects.filter(id=user_id)
+            .values_list("profile_version", flat=True)
+            .first()
+        )
+        if version is not None:
+            profile_versions.set(key, version)
+    return version
+
+
+def forget_profile_version(user_id):
+    profile_versions.delete(profile_version_key(user_id))
+
+
+def add_profile_claims(token, user):
+    token["profile"] = user.profile_claims()
 
 
 class CustomUserJWTAuthentication(BaseAuthentication):
@@ -16,19 +71,34 @@ class CustomUserJWTAuthentication(BaseAuthentication):
         try:
             prefix, token = auth_header.split()
             assert prefix.lower() == "bearer"
-        except ValueError:
+        except (ValueError, AssertionError):
             raise exceptions.AuthenticationFailed(
                 "Authorization header must contain two space-delimited values"
             )
         try:
-            UntypedToken(token)
+            validated = UntypedToken(token)
+            admin_id = validated["id"]
         except (InvalidToken, TokenError) as e:
             raise exceptions.AuthenticationFailed(f"Token invalid: {e}")
-        admin_id = UntypedToken(token)["id"]
-        
+        except KeyError:
+            raise exceptions.AuthenticationFailed("Token invalid: no user id")
+
+        if revocations.is_revoked(validated.payload):
+            raise exceptions.AuthenticationFailed("Token has been revoked")
+
+        # Tokens with profile claims skip the user lookup while their
+        # profile is still the current one.
+        profile = validated.get("profile")
+        if profile is not None:
+            current = get_profile_version(admin_id)
+            if current is None:
+                raise exceptions.AuthenticationFailed("User not found")
+            if profile["version"] >= current:
+                return (UserModel.from_claims(admin_id, profile), validated)
+
         try:
-            admin = UserModel.objects.get(id=admin_id)
+            admin = get_cached_user(admin_id)
         except UserModel.DoesNotExist:
             raise exceptions.AuthenticationFailed("User not found")
 
-        return (admin, None)
+        return (admin, validated)
@@ -0,0 +1,119 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+from PIL import Image, ImageOps, UnidentifiedImageError
+from rest_framework import serializers
+
+from Products.images import VARIANT_WIDTHS, flatten, variant_names
+
+
+AVATAR_SIZE = getattr(settings, "AVATAR_SIZE", 256)
+AVATAR_MAX_UPLOAD_SIZE = getattr(settings, "AVATAR_MAX_UPLOAD_SIZE", 10 * 1024 * 1024)
+AVATAR_MAX_PIXELS = getattr(settings, "AVATAR_MAX_PIXELS", 40_000_000)
+AVATAR_FORMATS = {"JPEG", "PNG", "WEBP", "GIF"}
+# Avatars are stored at AVATAR_SIZE, so larger variants would be copies.
+AVATAR_VARIANT_WIDTHS = tuple(width for width in VARIANT_WIDTHS if width < AVATAR_SIZE)
+
+# Decoding is the memory heavy step; the pool caps how many uploads are
+# decoded at once no matter how many requests are in flight.
+pool = ThreadPoolExecutor(
+    max_workers=getattr(settings, "AVATAR_WORKERS", 2), thread_name_prefix="avatar"
+)
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Streams every upload to a temp file and stops past ``max_size`` bytes."""
+
+    max_size = AVATAR_MAX_UPLOAD_SIZE
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.received = 0
+        self.exceeded = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.exceeded = True
+            raise StopUpload(connection_reset=True)
+        return super().receive_data_chunk(raw_data, start)
+
+
+def stream_uploads(request):
+    """
+    Switches ``request`` (before its body is read) to temp-file uploads with
+    the avatar size cap. Returns the handler, or None when the declared body
+    is already too large to accept.
+    """
+    content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+    # Room for the multipart boundaries and the other form fields.
+    if content_length > AVATAR_MAX_UPLOAD_SIZE + 64 * 1024:
+        return None
+    handler = LimitedTemporaryFileUploadHandler(request._request)
+    request._request.upload_handlers = [handler]
+    return handler
+
+
+def probe(uploaded):
+    """Format and size from the image header only; nothing is decoded."""
+    try:
+        with Image.open(uploaded) as image:
+            image_format, (width, height) = image.format, image.size
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        raise serializers.ValidationError("Upload a valid image.")
+    finally:
+        uploaded.seek(0)
+    if image_format not in AVATAR_FORMATS:
+        formats = ", ".join(sorted(AVATAR_FORMATS))
+        raise serializers.ValidationError(
+            f"Unsupported image format, use one of: {formats}."
+        )
+    if width * height > AVATAR_MAX_PIXELS:
+        raise serializers.ValidationError("Image dimensions are too large.")
+
+
+def render_avatar(source):
+    """
+    Square ``AVATAR_SIZE`` JPEG of ``source``, EXIF orientation applied and
+    all metadata (EXIF, GPS, ICC, comments) dropped.
+    """
+    with Image.open(source) as original:
+        # JPEG only: decode at 1/2..1/8 scale while staying above the target.
+        original.draft("RGB", (AVATAR_SIZE, AVATAR_SIZE))
+        image = flatten(ImageOps.exif_transpose(original))
+        image = ImageOps.fit(image, (AVATAR_SIZE, AVATAR_SIZE), Image.LANCZOS)
+    image.info = {}
+    buffer = BytesIO()
+    image.save(buffer, "JPEG", quality=85, optimize=True, progressive=True)
+    return ContentFile(buffer.getvalue(), name=f"{uuid.uuid4().hex}.jpg")
+
+
+class AvatarField(serializers.FileField):
+    """
+    Accepts an uploaded image and returns the normalized avatar. The header
+    is checked before anything is decoded; the resize runs in the pool.
+    """
+
+    def to_internal_value(self, data):
+        uploaded = super().to_internal_value(data)
+        probe(uploaded)
+        source = (
+            uploaded.temporary_file_path()
+            if hasattr(uploaded, "temporary_file_path")
+            else uploaded
+        )
+        try:
+            return pool.submit(render_avatar, source).result()
+        except (OSError, Image.DecompressionBombError):
+            raise serializers.ValidationError("Upload a valid image.")
+
+
+def delete_avatar(storage, name):
+    """Removes a replaced avatar and the variants built from it."""
+    for _, _, variant in variant_names(name):
+        storage.delete(variant)
+    storage.delete(name)
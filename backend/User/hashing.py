@@ -0,0 +1,31 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, verify_password
+
+
+# hashlib's PBKDF2 releases the GIL, so threads hash in parallel while the
+# event loop keeps serving other requests. The pool size caps how many
+# hashes run at once; further logins wait in the pool's queue.
+HASHING_WORKERS = (
+    getattr(settings, "PASSWORD_HASHING_WORKERS", None) or os.cpu_count() or 2
+)
+
+pool = ThreadPoolExecutor(
+    max_workers=HASHING_WORKERS, thread_name_prefix="password-hashing"
+)
+
+
+async def run_in_pool(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+
+
+async def averify_password(raw_password, encoded):
+    """``(is_correct, must_update)`` computed in the hashing pool."""
+    return await run_in_pool(verify_password, raw_password, encoded)
+
+
+async def amake_password(raw_password):
+    return await run_in_pool(make_password, raw_password)
@@ -0,0 +1,104 @@
+import asyncio
+import copy
+import statistics
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+
+from User.hashing import HASHING_WORKERS
+from User.models import UserModel
+
+
+SYNC_URL = "/api/v1/authentication/auth/login/"
+ASYNC_URL = "/api/v1/authentication/auth/login/async/"
+PASSWORD = "Bench-pass-1"
+
+
+def summary(label, latencies, elapsed):
+    latencies = sorted(latencies)
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    return (
+        f"{label}: {len(latencies) / elapsed:.1f} logins/s, "
+        f"p50 {statistics.median(latencies) * 1000:.0f}ms, p95 {p95 * 1000:.0f}ms"
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure login throughput of one worker process: the sync view one "
+        "request at a time (a gunicorn sync worker) against the async view "
+        "with concurrent requests (an ASGI worker with the hashing pool). "
+        "Uses a throwaway user in the configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=100)
+        parser.add_argument("--concurrency", type=int, default=16)
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--requests and --concurrency must be at least 1")
+
+        rest_framework = copy.deepcopy(settings.REST_FRAMEWORK)
+        rates = rest_framework.get("DEFAULT_THROTTLE_RATES", {})
+        for scope in ("login_ip", "login_email"):
+            rates.pop(scope, None)
+
+        email = f"bench-{uuid.uuid4().hex[:12]}@example.invalid"
+        user = UserModel.objects.create(email=email, password=PASSWORD)
+        payload = {"email": email, "password": PASSWORD}
+        try:
+            with override_settings(
+                REST_FRAMEWORK=rest_framework,
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            ):
+                self.stdout.write(
+                    f"{options['requests']} logins, hashing pool of {HASHING_WORKERS}"
+                )
+                self.stdout.write(self.bench_sync(payload, options["requests"]))
+                self.stdout.write(asyncio.run(self.bench_async(
+                    payload, options["requests"], options["concurrency"]
+                )))
+        finally:
+            user.delete()
+
+    def bench_sync(self, payload, requests):
+        client = Client()
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(requests):
+            begin = time.perf_counter()
+            response = client.post(SYNC_URL, payload, content_type="application/json")
+            latencies.append(time.perf_counter() - begin)
+            if response.status_code != 200:
+                raise CommandError(
+                    f"sync login failed: {response.status_code} "
+                    f"{response.content[:200]!r}"
+                )
+        return summary("sync, sequential", latencies, time.perf_counter() - started)
+
+    async def bench_async(self, payload, requests, concurrency):
+        client = AsyncClient()
+        limit = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def login():
+            async with limit:
+                begin = time.perf_counter()
+                response = await client.post(
+                    ASYNC_URL, payload, content_type="application/json"
+                )
+                latencies.append(time.perf_counter() - begin)
+                if response.status_code != 200:
+                    raise CommandError(
+                        f"async login failed: {response.status_code} "
+                        f"{response.content[:200]!r}"
+                    )
+
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+        return summary(f"async, {concurrency} concurrent", latencies, elapsed)
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from User.models import RevokedTokenModel
+
+
+class Command(BaseCommand):
+    help = "Delete token revocations whose tokens have expired anyway, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        started = time.monotonic()
+        expired = RevokedTokenModel.objects.filter(
+            expires_at__lt=timezone.now()
+        ).order_by("expires_at")
+        deleted = 0
+        while True:
+            ids = list(expired.values_list("id", flat=True)[:batch_size])
+            if not ids:
+                break
+            deleted += RevokedTokenModel.objects.filter(id__in=ids).delete()[0]
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Deleted {deleted} expired revocations in {elapsed:.2f}s"
+            )
+        )
@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from User.outbox import send_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver queued emails from the outbox in batches, one SMTP connection "
+        "per batch. Failures are retried with exponential backoff and parked as "
+        "Dead after EMAIL_OUTBOX_MAX_ATTEMPTS. Without --loop it exits once "
+        "nothing is due."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help=(
+                "Keep polling for new mail instead of exiting when the outbox "
+                "is empty."
+            ),
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=2.0,
+            help="Seconds to wait between polls in --loop mode.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        totals = [0, 0, 0]
+        try:
+            while True:
+                started = time.monotonic()
+                result = send_batch(batch_size)
+                totals = [total + count for total, count in zip(totals, result)]
+                if any(result):
+                    self.stdout.write(
+                        "sent {}, retrying {}, dead {} in {:.2f}s".format(
+                            *result, time.monotonic() - started
+                        )
+                    )
+                if sum(result) == batch_size:
+                    continue
+                if not options["loop"]:
+                    break
+                connection.close()
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(
+            self.style.SUCCESS("Sent {}, retrying {}, dead {}".format(*totals))
+        )
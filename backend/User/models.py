@@ -1,22 +1,35 @@
+from django.conf import settings
 from django.db import models
+from django.db.models import F
 from django.contrib.auth.hashers import (
     make_password,
     check_password as dj_check_password,
 )
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 import datetime
 
 
 from .validators import validate_strong_password
 
 
+OTP_TTL = getattr(settings, "OTP_TTL", datetime.timedelta(minutes=5))
+OTP_DIGITS = getattr(settings, "OTP_DIGITS", 6)
+
+
 class UserModel(models.Model):
     first_name = models.CharField(max_length=255, default="", blank=True)
     last_name = models.CharField(max_length=255, default="", blank=True)
     email = models.EmailField(unique=True)
-    password = models.CharField(max_length=65, validators=[validate_strong_password])
+    password = models.CharField(max_length=128, validators=[validate_strong_password])
     profile_image = models.ImageField(upload_to="user/", null=True, blank=True)
+    # Avatar variant widths on disk; written by generate_variants only.
+    profile_image_variant_widths = models.JSONField(
+        default=list, blank=True, editable=False
+    )
     date_joined = models.DateTimeField(auto_now_add=True)
+    # Bumped on every save; tokens carrying an older profile are re-checked.
+    profile_version = models.PositiveIntegerField(default=0)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["email", "password"]
@@ -25,21 +38,156 @@ class UserModel(models.Model):
         self.password = make_password(raw_password)
 
     def check_password(self, raw_password: str) -> bool:
-        return dj_check_password(raw_password, self.password)
+        # Re-hash with the preferred hasher when PASSWORD_HASHERS or its
+        # cost changed since the password was stored.
+        return dj_check_password(
+            raw_password, self.password, setter=self.store_password
+        )
+
+    def store_password(self, raw_password: str) -> None:
+        """
+        Saves a new hash without touching the rest of the row, so a rehash
+        at login does not count as a profile change.
+        """
+        self.set_password(raw_password)
+        UserModel.objects.filter(id=self.id).update(password=self.password)
+
+    @classmethod
+    def from_claims(cls, user_id, profile):
+        """
+        Read-only user rebuilt from the profile claims of an access token.
+        It carries no password and refuses to be saved.
+        """
+        user = cls(
+            id=user_id,
+            first_name=profile["first_name"],
+            last_name=profile["last_name"],
+            email=profile["email"],
+            profile_image=profile["profile_image"] or None,
+            profile_image_variant_widths=profile.get("image_variant_widths", []),
+            date_joined=parse_datetime(profile["date_joined"]),
+            profile_version=profile["version"],
+        )
+        user._state.adding = False
+        user._from_claims = True
+        return user
+
+    def profile_claims(self):
+        return {
+            "first_name": self.first_name,
+            "last_name": self.last_name,
+            "email": self.email,
+            "profile_image": self.profile_image.name if self.profile_image else "",
+            "image_variant_widths": self.profile_image_variant_widths,
+            "date_joined": self.date_joined.isoformat(),
+            "version": self.profile_version,
+        }
 
     def save(self, *args, **kwargs):
+        if getattr(self, "_from_claims", False):
+            raise ValueError(
+                "Users built from token claims cannot be saved; "
+                "load it from the database"
+            )
         if self.password and "$" not in self.password:
             self.password = make_password(self.password)
+        bump = not self._state.adding
+        if bump:
+            # Incremented in SQL so two concurrent saves both count.
+            self.profile_version = F("profile_version") + 1
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "profile_version"}
         super().save(*args, **kwargs)
+        if bump:
+            self.refresh_from_db(fields=["profile_version"])
 
     def __str__(self):
         return self.first_name + " " + self.last_name
 
 class OTP(models.Model):
+    """
+    The latest code sent to an email; requesting a new one overwrites it.
+    Rows older than OTP_TTL are expired and removed by purge_otps.
+    """
     email = models.EmailField(unique=True)
-    otp_code = models.CharField(max_length=6)
-    created_at = models.DateTimeField(auto_now_add=True)
+    otp_code = models.CharField(max_length=OTP_DIGITS)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
     is_verified = models.BooleanField(default=False)
 
+    @classmethod
+    def issue(cls, email, otp_code):
+        """Stores a fresh code for ``email`` with a single upsert statement."""
+        cls.objects.bulk_create(
+            [cls(email=email, otp_code=otp_code, created_at=timezone.now())],
+            update_conflicts=True,
+            unique_fields=["email"],
+            update_fields=["otp_code", "created_at", "is_verified"],
+        )
+
+    @classmethod
+    def expired(cls):
+        return cls.objects.filter(created_at__lt=timezone.now() - OTP_TTL)
+
     def is_expired(self):
-        return timezone.now() > self.created_at + datetime.timedelta(minutes=5)
+        return timezone.now() > self.created_at + OTP_TTL
+
+
+class EmailOutboxModel(models.Model):
+    """
+    Mail waiting to be delivered by the send_outbox command. Failed sends
+    are retried with backoff until MAX attempts, then parked as Dead. The
+    body is blanked once the message is Sent.
+    """
+    PENDING = "Pending"
+    SENT = "Sent"
+    DEAD = "Dead"
+    CHOICES = (
+        (PENDING, "pending"),
+        (SENT, "sent"),
+        (DEAD, "dead"),
+    )
+
+    to = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, default="", blank=True)
+    status = models.CharField(max_length=10, choices=CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(default="", blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Outgoing email"
+        verbose_name_plural = "Email outbox"
+        indexes = [
+            models.Index(
+                fields=["status", "next_attempt_at"], name="outbox_status_due_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to} ({self.status})"
+
+
+class RevokedTokenModel(models.Model):
+    """
+    Either one revoked token (``jti``) or, with ``issued_before`` set, every
+    token of ``user`` issued before that Unix time. Rows can go once
+    ``expires_at`` passes: the tokens they cover have expired by then.
+    """
+    user = models.ForeignKey(
+        UserModel,
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+    jti = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    issued_before = models.PositiveBigIntegerField(null=True, blank=True)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        if self.jti:
+            return f"token {self.jti} of user {self.user_id}"
+        return f"tokens of user {self.user_id} issued before {self.issued_before}"
@@ -0,0 +1,110 @@
+import datetime
+import logging
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EmailOutboxModel
+
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = getattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 6)
+RETRY_BASE = getattr(
+    settings, "EMAIL_OUTBOX_RETRY_BASE", datetime.timedelta(seconds=30)
+)
+RETRY_MAX = getattr(settings, "EMAIL_OUTBOX_RETRY_MAX", datetime.timedelta(hours=1))
+# A claimed row is hidden from other workers for this long; if the worker
+# dies mid-batch the row becomes due again afterwards.
+CLAIM_LEASE = datetime.timedelta(minutes=5)
+
+
+def enqueue_email(to, subject, body, from_email=None):
+    """Stores a message for the send_outbox worker and returns the row."""
+    return EmailOutboxModel.objects.create(
+        to=to,
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.EMAIL_HOST_USER,
+    )
+
+
+def retry_delay(attempts):
+    """Exponential backoff: RETRY_BASE, doubled per attempt, capped at RETRY_MAX."""
+    return min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX)
+
+
+def claim_batch(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            EmailOutboxModel.objects.select_for_update(skip_locked=True)
+            .filter(status=EmailOutboxModel.PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        EmailOutboxModel.objects.filter(id__in=[row.id for row in rows]).update(
+            next_attempt_at=now + CLAIM_LEASE
+        )
+    return rows
+
+
+def send_batch(batch_size=100):
+    """
+    Sends up to ``batch_size`` due messages over one SMTP connection and
+    records the outcome of each. Returns ``(sent, retried, dead)``.
+    """
+    rows = claim_batch(batch_size)
+    if not rows:
+        return 0, 0, 0
+
+    sent, failed = [], []
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+        for row in rows:
+            message = EmailMessage(
+                subject=row.subject,
+                body=row.body,
+                from_email=row.from_email or None,
+                to=[row.to],
+                connection=connection,
+            )
+            try:
+                message.send()
+            except Exception as e:
+                logger.warning("Sending outbox email %s failed: %s", row.id, e)
+                failed.append((row, repr(e)))
+                # The server may have dropped us; start the next message clean.
+                connection.close()
+                connection.open()
+            else:
+                sent.append(row.id)
+    except Exception as e:
+        # Could not (re)connect: every message not sent yet is retried.
+        logger.warning("Outbox SMTP connection failed: %s", e)
+        done = set(sent) | {row.id for row, _ in failed}
+        failed += [(row, repr(e)) for row in rows if row.id not in done]
+    finally:
+        connection.close()
+
+    now = timezone.now()
+    # Bodies carry one-time codes; nothing needs them once delivered.
+    EmailOutboxModel.objects.filter(id__in=sent).update(
+        status=EmailOutboxModel.SENT, sent_at=now, last_error="", body=""
+    )
+    dead = 0
+    for row, error in failed:
+        row.attempts += 1
+        row.last_error = error
+        if row.attempts >= MAX_ATTEMPTS:
+            row.status = EmailOutboxModel.DEAD
+            dead += 1
+        else:
+            row.next_attempt_at = now + retry_delay(row.attempts)
+    EmailOutboxModel.objects.bulk_update(
+        [row for row, _ in failed],
+        ["attempts", "last_error", "status", "next_attempt_at"],
+    )
+    return len(sent), len(failed) - dead, dead
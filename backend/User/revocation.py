@@ -0,0 +1,119 @@
+import datetime
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .models import RevokedTokenModel
+
+
+REFRESH_INTERVAL = getattr(settings, "TOKEN_REVOCATION_REFRESH_SECONDS", 5)
+
+
+def token_user_id(payload):
+    return int(payload["id"])
+
+
+class RevocationMirror:
+    """
+    Per-worker copy of RevokedTokenModel: a dict of revoked jtis and the
+    "issued before" cut-off per user. Checks are dictionary lookups; at most
+    one query every REFRESH_INTERVAL seconds pulls the rows added since the
+    last one (by id), so other workers' revocations apply within that delay.
+    Entries are dropped once the tokens they cover have expired.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.jtis = {}
+        self.issued_before = {}
+        self.last_id = 0
+        self.refreshed_at = None
+
+    def is_revoked(self, payload):
+        self.maybe_refresh()
+        if payload.get("jti") in self.jtis:
+            return True
+        cutoff = self.issued_before.get(token_user_id(payload))
+        return cutoff is not None and payload.get("iat", 0) < cutoff[0]
+
+    def maybe_refresh(self):
+        now = time.monotonic()
+        if self.refreshed_at is not None and now - self.refreshed_at < REFRESH_INTERVAL:
+            return
+        if not self.lock.acquire(blocking=self.refreshed_at is None):
+            return  # another thread is refreshing; use what we have
+        try:
+            rows = RevokedTokenModel.objects.filter(
+                id__gt=self.last_id, expires_at__gt=timezone.now()
+            ).order_by("id").values_list(
+                "id", "user_id", "jti", "issued_before", "expires_at"
+            )
+            for row_id, user_id, jti, issued_before, expires_at in rows:
+                self.add(user_id, jti, issued_before, expires_at)
+                self.last_id = row_id
+            self.prune()
+            self.refreshed_at = time.monotonic()
+        finally:
+            self.lock.release()
+
+    def add(self, user_id, jti, issued_before, expires_at):
+        if jti:
+            self.jtis[jti] = expires_at
+        elif issued_before is not None:
+            current = self.issued_before.get(user_id)
+            if current is None or issued_before > current[0]:
+                self.issued_before[user_id] = (issued_before, expires_at)
+
+    def prune(self):
+        now = timezone.now()
+        self.jtis = {
+            jti: expires for jti, expires in self.jtis.items() if expires > now
+        }
+        self.issued_before = {
+            user_id: entry
+            for user_id, entry in self.issued_before.items()
+            if entry[1] > now
+        }
+
+    def record(self, row):
+        """Applies a revocation written by this worker right away."""
+        with self.lock:
+            self.add(row.user_id, row.jti, row.issued_before, row.expires_at)
+
+
+revocations = RevocationMirror()
+
+
+def revoke_token(token):
+    """Revokes one validated token until it expires."""
+    expires_at = datetime.datetime.fromtimestamp(token["exp"], tz=datetime.timezone.utc)
+    row, _ = RevokedTokenModel.objects.get_or_create(
+        jti=token["jti"],
+        defaults={"user_id": token_user_id(token), "expires_at": expires_at},
+    )
+    revocations.record(row)
+    return row
+
+
+def revoke_all_tokens(user_id):
+    """
+    Revokes every token of the user issued before the current second. ``iat``
+    only has whole seconds, so the cut-off is the current second itself:
+    tokens issued right after the revoke, in the same second, stay valid.
+    """
+    lifetime = max(
+        jwt_settings.ACCESS_TOKEN_LIFETIME, jwt_settings.REFRESH_TOKEN_LIFETIME
+    )
+    row = RevokedTokenModel.objects.create(
+        user_id=user_id,
+        issued_before=int(time.time()),
+        expires_at=timezone.now() + lifetime,
+    )
+    revocations.record(row)
+    return row
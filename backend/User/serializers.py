@@ -1,6 +1,7 @@
 from rest_framework.serializers import ModelSerializer
 from rest_framework import serializers
 
+from .avatars import AvatarField
 from .models import UserModel, OTP
 
 class OTPVerifySerializer(ModelSerializer):
@@ -10,6 +11,8 @@ class OTPVerifySerializer(ModelSerializer):
 
 
 class UserCreateSerializer(ModelSerializer):
+    profile_image = AvatarField(required=False)
+
     class Meta:
         model = UserModel
         fields = ['first_name','last_name','email','password','profile_image']
@@ -20,4 +23,8 @@ class UserCreateSerializer(ModelSerializer):
 
 class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
-    password = serializers.CharField()
\ No newline at end of file
+    password = serializers.CharField()
+
+
+class ProfileImageSerializer(serializers.Serializer):
+    profile_image = AvatarField()
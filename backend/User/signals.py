@@ -0,0 +1,26 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from Products.images import generate_variants, image_changed, track_image_changes
+from .avatars import AVATAR_VARIANT_WIDTHS
+from .authentication import forget_profile_version, forget_user
+from .models import UserModel
+
+
+track_image_changes(UserModel, "profile_image")
+
+
+@receiver(post_save, sender=UserModel)
+def build_profile_image_variants(sender, instance, raw=False, **kwargs):
+    if raw or not image_changed(instance, "profile_image"):
+        return
+    generate_variants(instance.profile_image, widths=AVATAR_VARIANT_WIDTHS)
+
+
+@receiver(post_save, sender=UserModel)
+@receiver(post_delete, sender=UserModel)
+def drop_cached_user(sender, instance, **kwargs):
+    forget_user(instance.id)
+    user_id = instance.id
+    transaction.on_commit(lambda: forget_profile_version(user_id))
@@ -0,0 +1,531 @@
+import datetime
+import os
+import smtplib
+import socket
+import tempfile
+import time
+from io import BytesIO, StringIO
+from unittest import mock, skipIf
+
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.core.management import call_command
+from django.test import AsyncClient, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .authentication import profile_versions, user_cache
+from PIL import Image
+
+from .avatars import AVATAR_SIZE, LimitedTemporaryFileUploadHandler
+from .models import OTP, OTP_DIGITS, EmailOutboxModel, UserModel
+from .outbox import enqueue_email
+from .revocation import RevocationMirror, revocations
+from .throttling import IPRateThrottle, parse_rate, store as rate_limits
+from .utils import get_otp
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+
+PROFILE_URL = "/api/v1/authentication/api/get-profile/"
+LOGIN_URL = "/api/v1/authentication/auth/login/"
+ASYNC_LOGIN_URL = "/api/v1/authentication/auth/login/async/"
+PROFILE_IMAGE_URL = "/api/v1/authentication/api/profile-image/"
+LOGOUT_URL = "/api/v1/authentication/auth/logout/"
+REVOKE_ALL_URL = "/api/v1/authentication/auth/revoke-all/"
+REQUEST_OTP_URL = "/api/v1/authentication/request-otp/"
+VERIFY_URL = "/api/v1/authentication/verify-email/"
+
+
+def isolate_rate_limits(testcase):
+    """Points the token buckets at an empty file private to ``testcase``."""
+    directory = tempfile.TemporaryDirectory()
+    testcase.addCleanup(directory.cleanup)
+    settings_override = override_settings(
+        RATE_LIMIT_DB=os.path.join(directory.name, "ratelimit.sqlite3")
+    )
+    settings_override.enable()
+    testcase.addCleanup(settings_override.disable)
+
+
+def auth_client(user):
+    refresh = RefreshToken.for_user(user)
+    refresh["id"] = user.id
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+    return client
+
+
+class AuthenticationCacheTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = UserModel.objects.create(
+            email="reader@example.com", password="Secret-pass1", first_name="Ann"
+        )
+        self.client = auth_client(self.user)
+
+    def test_repeated_requests_skip_the_user_query(self):
+        self.client.get(PROFILE_URL)
+        with self.assertNumQueries(0):
+            response = self.client.get(PROFILE_URL)
+        self.assertEqual(response.status_code, 200)
+
+    def test_save_and_delete_drop_the_cached_user(self):
+        self.client.get(PROFILE_URL)
+        self.user.first_name = "Bea"
+        self.user.save()
+        self.assertEqual(self.client.get(PROFILE_URL).data["first_name"], "Bea")
+
+        self.user.delete()
+        self.assertEqual(self.client.get(PROFILE_URL).data["detail"], "User not found")
+
+
+@override_settings(AUTH_PROFILE_CLAIMS=True)
+class ProfileClaimsTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        profile_versions.clear()
+        isolate_rate_limits(self)
+        self.user = UserModel.objects.create(
+            email="claims@example.com", password="Secret-pass1", first_name="Ann"
+        )
+        response = self.client.post(
+            LOGIN_URL, {"email": "claims@example.com", "password": "Secret-pass1"}
+        )
+        self.api = APIClient()
+        self.api.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {response.data['access_token']}"
+        )
+
+    def test_profile_is_served_from_the_token(self):
+        self.api.get(PROFILE_URL)
+        with self.assertNumQueries(0):
+            response = self.api.get(PROFILE_URL)
+        self.assertEqual(response.data["first_name"], "Ann")
+        self.assertEqual(response.data["email"], "claims@example.com")
+
+    def test_stale_claims_fall_back_to_the_database(self):
+        self.api.get(PROFILE_URL)
+        self.user.first_name = "Bea"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.api.get(PROFILE_URL).data["first_name"], "Bea")
+
+    def test_concurrent_saves_both_bump_the_version(self):
+        version = self.user.profile_version
+        first = UserModel.objects.get(pk=self.user.pk)
+        second = UserModel.objects.get(pk=self.user.pk)
+
+        first.first_name = "Bea"
+        first.save(update_fields=["first_name"])
+        second.last_name = "Cole"
+        second.save(update_fields=["last_name"])
+
+        self.assertEqual(first.profile_version, version + 1)
+        self.assertEqual(second.profile_version, version + 2)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.profile_version, version + 2)
+
+
+class OTPTests(TestCase):
+    email = "otp@example.com"
+
+    def setUp(self):
+        isolate_rate_limits(self)
+
+    def test_codes_have_a_fixed_number_of_digits(self):
+        for _ in range(200):
+            code = get_otp()
+            self.assertEqual(len(code), 6)
+            self.assertTrue(code.isdigit())
+        self.assertEqual(OTP._meta.get_field("otp_code").max_length, OTP_DIGITS)
+
+    def test_resend_replaces_the_code(self):
+        response = self.client.post(REQUEST_OTP_URL, {"email": self.email})
+        self.assertEqual(response.status_code, 200)
+        first = OTP.objects.get(email=self.email).otp_code
+        OTP.objects.filter(email=self.email).update(otp_code="000000", is_verified=True)
+
+        response = self.client.post(REQUEST_OTP_URL, {"email": self.email})
+        self.assertEqual(response.status_code, 200)
+        otp = OTP.objects.get(email=self.email)
+        self.assertNotEqual(otp.otp_code, "000000")
+        self.assertFalse(otp.is_verified)
+        self.assertEqual(len(first), 6)
+
+    def test_expired_code_is_rejected(self):
+        OTP.issue(self.email, "123456")
+        OTP.objects.filter(email=self.email).update(
+            created_at=timezone.now() - datetime.timedelta(minutes=6)
+        )
+
+        response = self.client.post(
+            VERIFY_URL, {"email": self.email, "otp_code": "123456"}
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("expired", response.data["error"])
+        call_command("purge_otps", stdout=StringIO())
+        self.assertFalse(OTP.objects.exists())
+
+    def test_fresh_code_verifies(self):
+        OTP.issue(self.email, "123456")
+        response = self.client.post(
+            VERIFY_URL, {"email": self.email, "otp_code": "123456"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(OTP.objects.get(email=self.email).is_verified)
+
+
+class RateLimitTests(TestCase):
+    def setUp(self):
+        isolate_rate_limits(self)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate("5/min"), (5, 5 / 60))
+        self.assertEqual(parse_rate("3/10m"), (3, 3 / 600))
+        with self.assertRaises(ValueError):
+            parse_rate("5 per minute")
+
+    def test_bucket_refills_over_time(self):
+        self.assertEqual(rate_limits.consume("k", 2, 1.0), (True, 0))
+        self.assertEqual(rate_limits.consume("k", 2, 1.0), (True, 0))
+        allowed, retry_after = rate_limits.consume("k", 2, 1.0)
+        self.assertFalse(allowed)
+        self.assertGreater(retry_after, 0.5)
+        self.assertLessEqual(retry_after, 1)
+
+    def test_forwarded_for_is_ignored_without_trusted_proxies(self):
+        factory = APIRequestFactory()
+        keys = {
+            IPRateThrottle().get_key(
+                factory.post(LOGIN_URL, HTTP_X_FORWARDED_FOR=f"10.0.0.{n}"), None
+            )
+            for n in range(3)
+        }
+        self.assertEqual(keys, {"127.0.0.1"})
+
+    def test_non_object_body_is_not_an_error(self):
+        response = self.client.post(LOGIN_URL, [], content_type="application/json")
+        self.assertLess(response.status_code, 500)
+
+    def test_login_is_rejected_per_email_before_checking_the_password(self):
+        payload = {"email": "victim@example.com", "password": "wrong"}
+        for _ in range(10):
+            self.assertEqual(self.client.post(LOGIN_URL, payload).status_code, 404)
+
+        with self.assertNumQueries(0):
+            response = self.client.post(LOGIN_URL, payload)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response["Retry-After"]), 1)
+
+        other = {"email": "someone@example.com", "password": "wrong"}
+        self.assertEqual(self.client.post(LOGIN_URL, other).status_code, 404)
+
+
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        revocations.reset()
+        self.addCleanup(revocations.reset)
+        self.user = UserModel.objects.create(
+            email="leaver@example.com", password="Secret-pass1"
+        )
+
+    def tokens(self):
+        refresh = RefreshToken.for_user(self.user)
+        refresh["id"] = self.user.id
+        return str(refresh), str(refresh.access_token)
+
+    def client_for(self, token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        return client
+
+    def assertRevoked(self, client):
+        response = client.get(PROFILE_URL)
+        self.assertEqual(response.data["detail"], "Token has been revoked")
+
+    def test_logout_revokes_the_access_and_refresh_tokens(self):
+        refresh, access = self.tokens()
+        _, other_access = self.tokens()
+        api = self.client_for(access)
+
+        response = api.post(LOGOUT_URL, {"refresh_token": refresh})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertRevoked(api)
+        self.assertRevoked(self.client_for(refresh))
+        other = self.client_for(other_access)
+        self.assertEqual(other.get(PROFILE_URL).status_code, 200)
+
+    def test_revoke_all_covers_every_earlier_token(self):
+        tokens = [self.tokens()[1] for _ in range(3)]
+
+        # The tokens were issued in an earlier second than the revoke.
+        with mock.patch("User.revocation.time.time", return_value=time.time() + 1):
+            response = self.client_for(tokens[0]).post(REVOKE_ALL_URL)
+        self.assertEqual(response.status_code, 200)
+
+        for token in tokens:
+            self.assertRevoked(self.client_for(token))
+
+    def test_login_right_after_revoke_all_works(self):
+        isolate_rate_limits(self)
+        _, access = self.tokens()
+        self.assertEqual(self.client_for(access).post(REVOKE_ALL_URL).status_code, 200)
+
+        response = self.client.post(
+            LOGIN_URL, {"email": "leaver@example.com", "password": "Secret-pass1"}
+        )
+
+        fresh = self.client_for(response.data["access_token"])
+        self.assertEqual(fresh.get(PROFILE_URL).status_code, 200)
+        self.assertRevoked(self.client_for(access))
+
+    def test_other_workers_pick_revocations_up_on_refresh(self):
+        _, access = self.tokens()
+        self.client_for(access).post(LOGOUT_URL)
+        payload = RefreshToken(self.tokens()[0]).payload
+
+        worker = RevocationMirror()
+        revoked = self.client_for(access)
+        with mock.patch("User.authentication.revocations", worker):
+            self.assertRevoked(revoked)
+            # Between refreshes the check is a dict lookup.
+            with self.assertNumQueries(0):
+                self.assertFalse(worker.is_revoked(payload))
+
+
+def jpeg_upload(size=(1200, 800), name="photo.jpg"):
+    exif = Image.Exif()
+    exif[0x010F] = "CameraMaker"
+    buffer = BytesIO()
+    Image.new("RGB", size, (200, 30, 30)).save(buffer, "JPEG", exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+
+class ProfileImageTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        user_cache.clear()
+        self.user = UserModel.objects.create(
+            email="face@example.com", password="Secret-pass1"
+        )
+        self.api = auth_client(self.user)
+
+    def put_image(self, upload):
+        return self.api.put(
+            PROFILE_IMAGE_URL, {"profile_image": upload}, format="multipart"
+        )
+
+    def test_upload_is_downscaled_and_stripped(self):
+        response = self.put_image(jpeg_upload())
+
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        with Image.open(self.user.profile_image.path) as image:
+            self.assertEqual(image.size, (AVATAR_SIZE, AVATAR_SIZE))
+            self.assertEqual(len(image.getexif()), 0)
+        # Variants at or above the stored size would only be copies of it.
+        self.assertEqual(list(response.data["profile_image_variants"]), ["160"])
+
+        profile = self.api.get(PROFILE_URL).data
+        self.assertEqual(
+            profile["profile_image_variants"], response.data["profile_image_variants"]
+        )
+
+    def test_replacing_the_image_deletes_the_old_file(self):
+        self.put_image(jpeg_upload())
+        self.user.refresh_from_db()
+        first = self.user.profile_image.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.put_image(jpeg_upload())
+
+        self.assertFalse(os.path.exists(first))
+
+    def test_signup_image_is_normalized_too(self):
+        response = self.client.post("/api/v1/authentication/create-account/", {
+            "email": "new-face@example.com",
+            "password": "Secret-pass1",
+            "profile_image": jpeg_upload(name="me.png"),
+        })
+
+        self.assertEqual(response.status_code, 201)
+        user = UserModel.objects.get(email="new-face@example.com")
+        self.assertTrue(user.profile_image.name.endswith(".jpg"))
+        with Image.open(user.profile_image.path) as image:
+            self.assertEqual(image.size, (AVATAR_SIZE, AVATAR_SIZE))
+
+    def test_non_image_is_rejected(self):
+        upload = SimpleUploadedFile(
+            "photo.jpg", b"not an image", content_type="image/jpeg"
+        )
+        response = self.put_image(upload)
+        self.assertEqual(response.status_code, 400)
+
+    def test_oversized_upload_is_stopped_while_streaming(self):
+        with mock.patch.object(LimitedTemporaryFileUploadHandler, "max_size", 10_000):
+            response = self.put_image(jpeg_upload((2000, 2000)))
+        self.assertEqual(response.status_code, 413)
+
+
+FAST_HASHERS = [
+    "django.contrib.auth.hashers.MD5PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+]
+
+
+class LoginHashingTests(TestCase):
+    password = "Secret-pass1"
+
+    def setUp(self):
+        isolate_rate_limits(self)
+        self.user = UserModel.objects.create(
+            email="hash@example.com", password=self.password
+        )
+        self.payload = {"email": "hash@example.com", "password": self.password}
+
+    async def test_async_login(self):
+        client = AsyncClient()
+        response = await client.post(
+            ASYNC_LOGIN_URL, self.payload, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("access_token", response.json())
+
+        wrong = {**self.payload, "password": "nope"}
+        response = await client.post(
+            ASYNC_LOGIN_URL, wrong, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_login_rehashes_when_the_preferred_hasher_changes(self):
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$"))
+        version = self.user.profile_version
+
+        with override_settings(PASSWORD_HASHERS=FAST_HASHERS):
+            self.assertEqual(self.client.post(LOGIN_URL, self.payload).status_code, 200)
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("md5$"))
+        self.assertEqual(self.user.profile_version, version)
+
+    async def test_async_login_rehashes_too(self):
+        with override_settings(PASSWORD_HASHERS=FAST_HASHERS):
+            response = await AsyncClient().post(
+                ASYNC_LOGIN_URL, self.payload, content_type="application/json"
+            )
+        self.assertEqual(response.status_code, 200)
+        user = await UserModel.objects.aget(id=self.user.id)
+        self.assertTrue(user.password.startswith("md5$"))
+
+
+class FlakyBackend(LocmemBackend):
+    """Locmem backend that refuses mail to addresses starting with "bounce"."""
+
+    def send_messages(self, messages):
+        for message in messages:
+            if message.to[0].startswith("bounce"):
+                raise smtplib.SMTPRecipientsRefused(
+                    {message.to[0]: (550, b"no such user")}
+                )
+        return super().send_messages(messages)
+
+
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        isolate_rate_limits(self)
+
+    def send_outbox(self):
+        call_command("send_outbox", stdout=StringIO())
+
+    def test_otp_request_is_queued_not_sent(self):
+        response = self.client.post(REQUEST_OTP_URL, {"email": "new@example.com"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        self.send_outbox()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["new@example.com"])
+        self.assertIn(OTP.objects.get().otp_code, mail.outbox[0].body)
+        row = EmailOutboxModel.objects.get()
+        self.assertEqual(row.status, EmailOutboxModel.SENT)
+        self.assertEqual(row.body, "")
+
+    @override_settings(EMAIL_BACKEND="User.tests.FlakyBackend")
+    def test_failures_back_off_then_go_dead(self):
+        enqueue_email("ok@example.com", "Hi", "body")
+        bounced = enqueue_email("bounce@example.com", "Hi", "body")
+
+        self.send_outbox()
+        bounced.refresh_from_db()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(bounced.status, EmailOutboxModel.PENDING)
+        self.assertEqual(bounced.attempts, 1)
+        self.assertGreater(bounced.next_attempt_at, timezone.now())
+
+        for _ in range(10):
+            EmailOutboxModel.objects.filter(id=bounced.id).update(
+                next_attempt_at=timezone.now()
+            )
+            self.send_outbox()
+        bounced.refresh_from_db()
+        self.assertEqual(bounced.status, EmailOutboxModel.DEAD)
+        self.assertIn("SMTPRecipientsRefused", bounced.last_error)
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.add(id(session))
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@skipIf(Controller is None, "aiosmtpd is not installed")
+class EmailOutboxSMTPTests(TestCase):
+    def setUp(self):
+        self.handler = RecordingHandler()
+        self.smtpd = Controller(self.handler, hostname="127.0.0.1", port=free_port())
+        self.smtpd.start()
+        self.addCleanup(self.smtpd.stop)
+
+    def test_batch_is_sent_over_one_connection(self):
+        for number in range(5):
+            enqueue_email(f"user{number}@example.com", "Code", "12345")
+
+        with self.settings(
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST=self.smtpd.hostname,
+            EMAIL_PORT=self.smtpd.port,
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER="",
+            EMAIL_HOST_PASSWORD="",
+        ):
+            call_command("send_outbox", stdout=StringIO())
+
+        self.assertEqual(len(self.handler.messages), 5)
+        self.assertEqual(len(self.handler.sessions), 1)
+        self.assertFalse(
+            EmailOutboxModel.objects.exclude(status=EmailOutboxModel.SENT).exists()
+        )
@@ -0,0 +1,152 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+DEFAULT_RATE_LIMIT_DB = settings.BASE_DIR / ".cache" / "ratelimit.sqlite3"
+# Buckets idle this long are full again and can be dropped.
+PRUNE_AFTER = 24 * 60 * 60
+PRUNE_EVERY = 1000
+
+_RATE_RE = re.compile(r"^(\d+)/(\d*)\s*(s|sec|m|min|h|hour|d|day)$")
+_UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+CONSUME_SQL = """
+INSERT INTO buckets (key, tokens, updated) VALUES (:key, :capacity - 1, :now)
+ON CONFLICT (key) DO UPDATE SET
+    tokens = min(:capacity, tokens + max(:now - updated, 0) * :rate) - 1,
+    updated = :now
+WHERE min(:capacity, tokens + max(:now - updated, 0) * :rate) >= 1
+RETURNING tokens
+"""
+
+
+def parse_rate(rate):
+    """
+    ``"5/min"`` or ``"3/10m"`` -> ``(capacity, tokens per second)``: the bucket
+    holds ``capacity`` requests and refills at capacity per period.
+    """
+    match = _RATE_RE.match(rate.strip())
+    if not match:
+        raise ValueError(f"Invalid rate {rate!r}, expected e.g. '5/min' or '3/10m'")
+    capacity, count, unit = int(match[1]), int(match[2] or 1), match[3]
+    return capacity, capacity / (count * _UNIT_SECONDS[unit[0]])
+
+
+class TokenBucketStore:
+    """
+    Token buckets in a small SQLite file next to the app, shared by every
+    worker on the host. A check is a single upsert statement, so concurrent
+    workers cannot both take the last token. Without a ``path`` the file is
+    the RATE_LIMIT_DB setting, looked up per check so it can be overridden.
+    """
+
+    def __init__(self, path=None):
+        self._path = path
+        self.local = threading.local()
+
+    @property
+    def path(self):
+        if self._path is not None:
+            return self._path
+        return str(getattr(settings, "RATE_LIMIT_DB", DEFAULT_RATE_LIMIT_DB))
+
+    def connection(self):
+        path = self.path
+        conn = getattr(self.local, "conn", None)
+        if conn is not None and self.local.path != path:
+            conn.close()
+            conn = None
+        if conn is None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+            # Counters are disposable: skip fsync, keep readers off the lock.
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self.local.conn = conn
+            self.local.path = path
+            self.local.checks = 0
+        return conn
+
+    def consume(self, key, capacity, rate):
+        """Takes one token. Returns ``(allowed, seconds until one is available)``."""
+        conn = self.connection()
+        now = time.time()
+        params = {"key": key, "capacity": capacity, "rate": rate, "now": now}
+        allowed = conn.execute(CONSUME_SQL, params).fetchone() is not None
+
+        self.local.checks += 1
+        if self.local.checks % PRUNE_EVERY == 0:
+            conn.execute("DELETE FROM buckets WHERE updated < ?", (now - PRUNE_AFTER,))
+
+        if allowed:
+            return True, 0
+        row = conn.execute(
+            "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+        ).fetchone()
+        available = min(capacity, row[0] + max(now - row[1], 0) * rate) if row else 0
+        return False, max(1 - available, 0) / rate
+
+    def clear(self):
+        self.connection().execute("DELETE FROM buckets")
+
+
+store = TokenBucketStore()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket per ``<view.throttle_scope>_<kind>`` rate from
+    DEFAULT_THROTTLE_RATES. Subclasses say what the bucket is keyed by;
+    requests without that key are not limited by the throttle.
+    """
+
+    kind = None
+
+    def get_key(self, request, view):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        scope = f"{view.throttle_scope}_{self.kind}"
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        key = self.get_key(request, view)
+        if rate is None or not key:
+            return True
+        allowed, self.retry_after = store.consume(f"{scope}:{key}", *parse_rate(rate))
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class IPRateThrottle(TokenBucketThrottle):
+    """
+    Keyed by the client address. X-Forwarded-For is only trusted as far as
+    the NUM_PROXIES setting says; with none, it is REMOTE_ADDR, so a client
+    cannot get a fresh bucket by sending its own header.
+    """
+
+    kind = "ip"
+
+    def get_key(self, request, view):
+        return self.get_ident(request)
+
+
+class EmailRateThrottle(TokenBucketThrottle):
+    kind = "email"
+
+    def get_key(self, request, view):
+        if not isinstance(request.data, dict):
+            return None
+        email = request.data.get("email")
+        return email.strip().lower() if isinstance(email, str) else None
@@ -1,10 +1,30 @@
 from django.urls import path
-from .views import RequestOTPView, VerifyEmail, UserCreateAPIView, UserLoginView,GetUserNameView
+from django.views.decorators.csrf import csrf_exempt
+from .views import (
+    RequestOTPView,
+    VerifyEmail,
+    UserCreateAPIView,
+    UserLoginView,
+    AsyncUserLoginView,
+    LogoutView,
+    RevokeAllTokensView,
+    GetUserNameView,
+    ProfileImageView,
+)
 
 urlpatterns = [
     path("request-otp/", RequestOTPView.as_view()),
     path("verify-email/", VerifyEmail.as_view()),
     path("create-account/",UserCreateAPIView.as_view()),
     path("auth/login/", UserLoginView.as_view(), name="student-login"),
+    # For ASGI deployments (config.asgi); hashing runs off the event loop.
+    path(
+        "auth/login/async/",
+        csrf_exempt(AsyncUserLoginView.as_view()),
+        name="student-login-async",
+    ),
+    path("auth/logout/", LogoutView.as_view(), name="logout"),
+    path("auth/revoke-all/", RevokeAllTokensView.as_view(), name="revoke-all-tokens"),
     path("api/get-profile/", GetUserNameView.as_view(), name="get-username"),
+    path("api/profile-image/", ProfileImageView.as_view(), name="profile-image"),
 ]
\ No newline at end of file
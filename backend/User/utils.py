@@ -1,4 +1,8 @@
-import random
+import secrets
+
+from .models import OTP_DIGITS
+
 
 def get_otp():
-    return random.randint(10000,99999)
\ No newline at end of file
+    """A random, zero padded code of exactly OTP_DIGITS digits."""
+    return f"{secrets.randbelow(10 ** OTP_DIGITS):0{OTP_DIGITS}d}"
@@ -1,27 +1,50 @@
+import math
+import secrets
+
+from django.http import JsonResponse
+from django.views import View
+from rest_framework.exceptions import ParseError
+from rest_framework.request import Request
 from rest_framework.views import APIView
 from rest_framework import generics, status
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
-from django.core.mail import send_mail
-from rest_framework.parsers import MultiPartParser, FormParser
+from django.db import transaction
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .serializers import OTPVerifySerializer, UserCreateSerializer, LoginSerializer
+from .serializers import (
+    OTPVerifySerializer, UserCreateSerializer, LoginSerializer, ProfileImageSerializer
+)
 from .models import OTP, UserModel
 from .utils import get_otp
+from .outbox import enqueue_email
 from django.conf import settings
-from .authentication import CustomUserJWTAuthentication
+from .authentication import CustomUserJWTAuthentication, add_profile_claims
+from .throttling import EmailRateThrottle, IPRateThrottle
+from .hashing import amake_password, averify_password
+from .revocation import revoke_all_tokens, revoke_token, token_user_id
+from .avatars import AVATAR_MAX_UPLOAD_SIZE, delete_avatar, stream_uploads
+from Products.images import variant_urls
 
 
 class RequestOTPView(APIView):
     """
     Send OTP to the user's email for verification during registration.
     """
+    throttle_classes = [IPRateThrottle, EmailRateThrottle]
+    throttle_scope = "otp"
+
     @swagger_auto_schema(
         tags=["Authentication"],
         operation_summary="Request OTP",
-        operation_description="Sends a One-Time Password (OTP) to the given email for verification. Email must not be already registered.",
+        operation_description=(
+            "Queues a One-Time Password (OTP) email to the given address for "
+            "verification and returns without waiting for delivery. Email must "
+            "not be already registered."
+        ),
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
             properties={
@@ -31,7 +54,8 @@ class RequestOTPView(APIView):
         ),
         responses={
             200: openapi.Response(description="OTP sent successfully"),
-            400: openapi.Response(description="Email already exists")
+            400: openapi.Response(description="Email already exists"),
+            429: openapi.Response(description="Too many requests, see Retry-After")
         }
     )
     def post(self, request, *args, **kwargs):
@@ -45,15 +69,14 @@ class RequestOTPView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         except UserModel.DoesNotExist:
-            # Send OTP
-            send_mail(
-                subject="Verification Code",
-                message=f"Your verification code is: {otp_code}",
-                from_email=settings.EMAIL_HOST_USER,
-                recipient_list=[email],
-                fail_silently=False,
-            )
-            OTP.objects.create(email=email, otp_code=otp_code)
+            # The send_outbox worker delivers the code.
+            with transaction.atomic():
+                OTP.issue(email, otp_code)
+                enqueue_email(
+                    to=email,
+                    subject="Verification Code",
+                    body=f"Your verification code is: {otp_code}",
+                )
             return Response(
                 data={"message": "OTP sent successfully", "email": email},
                 status=status.HTTP_200_OK
@@ -64,14 +87,24 @@ class VerifyEmail(APIView):
     """
     Verify user's email using the OTP code.
     """
+    throttle_classes = [IPRateThrottle, EmailRateThrottle]
+    throttle_scope = "verify"
+
     @swagger_auto_schema(
         tags=["Authentication"],
         operation_summary="Verify email with OTP",
-        operation_description="Verifies the user's email address by matching the provided OTP code.",
+        operation_description=(
+            "Verifies the user's email address by matching the provided OTP code. "
+            "Codes expire after OTP_TTL (5 minutes); requesting a new code replaces "
+            "the previous one."
+        ),
         request_body=OTPVerifySerializer,
         responses={
             200: openapi.Response(description="Email verified successfully"),
-            400: openapi.Response(description="Invalid OTP or email not found")
+            400: openapi.Response(
+                description="Invalid or expired OTP, or email not found"
+            ),
+            429: openapi.Response(description="Too many requests, see Retry-After")
         }
     )
     def post(self, request, *args, **kwargs):
@@ -85,10 +118,16 @@ class VerifyEmail(APIView):
                 data={"error": "Email not found"},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        if otp_instance.otp_code == otp_code:
+
+        if otp_instance.is_expired():
+            return Response(
+                data={"error": "OTP code has expired, request a new one"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if secrets.compare_digest(otp_instance.otp_code, str(otp_code or "")):
             otp_instance.is_verified = True
-            otp_instance.save()
+            otp_instance.save(update_fields=["is_verified"])
             return Response(
                 data={"message": "Verified successfully", "email": email},
                 status=status.HTTP_200_OK
@@ -110,7 +149,8 @@ class UserCreateAPIView(APIView):
         tags=["Authentication"],
         operation_summary="Create user account",
         operation_description="""
-Registers a new user. Password is hashed automatically. Profile image is optional.
+Registers a new user. Password is hashed automatically. Profile image is optional;
+it is streamed to disk, checked and stored as a square avatar without metadata.
 """,
         request_body=UserCreateSerializer,
         responses={
@@ -134,10 +174,16 @@ Registers a new user. Password is hashed automatically. Profile image is optiona
                 description="Validation error",
                 examples={"application/json": {"email": ["This field must be unique."]}}
             ),
+            413: openapi.Response(description="Profile image is too large"),
         }
     )
     def post(self, request, *args, **kwargs):
+        handler = stream_uploads(request)
+        if handler is None:
+            return upload_too_large()
         serializer = UserCreateSerializer(data=request.data)
+        if handler.exceeded:
+            return upload_too_large()
         if serializer.is_valid():
             user = serializer.save()
             return Response({
@@ -161,6 +207,8 @@ class UserLoginView(generics.GenericAPIView):
     """
     Login user and return JWT tokens.
     """
+    throttle_classes = [IPRateThrottle, EmailRateThrottle]
+    throttle_scope = "login"
     serializer_class = LoginSerializer
 
     @swagger_auto_schema(
@@ -173,6 +221,7 @@ class UserLoginView(generics.GenericAPIView):
             400: openapi.Response(description="Validation error"),
             401: openapi.Response(description="Incorrect password"),
             404: openapi.Response(description="User not found"),
+            429: openapi.Response(description="Too many requests, see Retry-After"),
         }
     )
     def post(self, request, *args, **kwargs):
@@ -191,13 +240,154 @@ class UserLoginView(generics.GenericAPIView):
         if not user.check_password(password):
             return Response({"error": "Incorrect password"}, status=status.HTTP_401_UNAUTHORIZED)
 
-        refresh = RefreshToken.for_user(user)
-        refresh["id"] = user.id
+        return Response(login_tokens(user), status=status.HTTP_200_OK)
 
-        return Response(
-            {"refresh_token": str(refresh), "access_token": str(refresh.access_token)},
-            status=status.HTTP_200_OK,
+
+def login_tokens(user):
+    refresh = RefreshToken.for_user(user)
+    refresh["id"] = user.id
+    access = refresh.access_token
+    if settings.AUTH_PROFILE_CLAIMS:
+        add_profile_claims(access, user)
+    return {"refresh_token": str(refresh), "access_token": str(access)}
+
+
+class AsyncUserLoginView(View):
+    """
+    UserLoginView for ASGI workers: the password check and any rehash run
+    in the bounded hashing pool, so the event loop keeps serving other
+    requests during PBKDF2. Same throttles, request and response shapes.
+    """
+    throttle_classes = [IPRateThrottle, EmailRateThrottle]
+    throttle_scope = "login"
+
+    async def post(self, request, *args, **kwargs):
+        request = Request(
+            request, parsers=[JSONParser(), FormParser(), MultiPartParser()]
         )
+        try:
+            data = request.data
+        except ParseError as e:
+            return JsonResponse({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        throttles = [throttle() for throttle in self.throttle_classes]
+        waits = [t.wait() for t in throttles if not t.allow_request(request, self)]
+        if waits:
+            response = JsonResponse(
+                {"detail": "Request was throttled."},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+            )
+            response["Retry-After"] = str(math.ceil(max(waits)))
+            return response
+
+        ser = LoginSerializer(data=data)
+        if not ser.is_valid():
+            return JsonResponse(
+                {"errors": ser.errors}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        email = ser.validated_data["email"]
+        password = ser.validated_data["password"]
+
+        user = await UserModel.objects.filter(email=email).afirst()
+        if user is None:
+            return JsonResponse(
+                {"error": "User not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        is_correct, must_update = await averify_password(password, user.password)
+        if not is_correct:
+            return JsonResponse(
+                {"error": "Incorrect password"}, status=status.HTTP_401_UNAUTHORIZED
+            )
+        if must_update:
+            user.password = await amake_password(password)
+            await UserModel.objects.filter(id=user.id).aupdate(password=user.password)
+
+        return JsonResponse(login_tokens(user), status=status.HTTP_200_OK)
+
+
+class LogoutView(APIView):
+    """
+    Revoke the access token used for this request (and optionally a refresh token).
+    """
+    authentication_classes = [CustomUserJWTAuthentication]
+
+    @swagger_auto_schema(
+        tags=["Authentication"],
+        operation_summary="Log out",
+        operation_description=(
+            "Revokes the bearer token of this request. Pass `refresh_token` to "
+            "revoke the matching refresh token as well. Other workers stop "
+            "accepting the tokens within TOKEN_REVOCATION_REFRESH_SECONDS."
+        ),
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                "refresh_token": openapi.Schema(
+                    type=openapi.TYPE_STRING, description="Refresh token to revoke too"
+                )
+            },
+        ),
+        responses={
+            200: openapi.Response(description="Logged out"),
+            400: openapi.Response(description="Invalid refresh token"),
+            401: openapi.Response(
+                description="Authentication credentials were not provided."
+            ),
+        },
+    )
+    def post(self, request, *args, **kwargs):
+        refresh = None
+        raw_refresh = request.data.get("refresh_token")
+        if raw_refresh:
+            try:
+                refresh = RefreshToken(raw_refresh)
+            except TokenError as e:
+                return Response(
+                    {"error": f"Invalid refresh token: {e}"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if token_user_id(refresh) != request.user.id:
+                return Response(
+                    {"error": "Refresh token belongs to another user"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        with transaction.atomic():
+            revoke_token(request.auth)
+            if refresh is not None:
+                revoke_token(refresh)
+        return Response({"message": "Logged out"}, status=status.HTTP_200_OK)
+
+
+class RevokeAllTokensView(APIView):
+    """
+    Revoke every token issued to the authenticated user so far.
+    """
+    authentication_classes = [CustomUserJWTAuthentication]
+
+    @swagger_auto_schema(
+        tags=["Authentication"],
+        operation_summary="Log out everywhere",
+        operation_description=(
+            "Revokes all access and refresh tokens issued to the authenticated user "
+            "until now, including the one used for this request. Log in again to "
+            "get new tokens."
+        ),
+        responses={
+            200: openapi.Response(description="All tokens revoked"),
+            401: openapi.Response(
+                description="Authentication credentials were not provided."
+            ),
+        },
+    )
+    def post(self, request, *args, **kwargs):
+        with transaction.atomic():
+            revoke_all_tokens(request.user.id)
+            # May have been issued within the cut-off second.
+            revoke_token(request.auth)
+        return Response({"message": "All tokens revoked"}, status=status.HTTP_200_OK)
 
 
 class GetUserNameView(APIView):
@@ -209,7 +399,11 @@ class GetUserNameView(APIView):
     @swagger_auto_schema(
         tags=["Userprofile"],
         operation_summary="Get authenticated user info",
-        operation_description="Returns the currently logged-in user's details. Requires valid JWT access token.",
+        operation_description=(
+            "Returns the currently logged-in user's details. Requires valid JWT "
+            "access token. Tokens issued with profile claims are answered from the "
+            "token while the profile has not changed since login."
+        ),
         responses={
             200: openapi.Response(
                 description="User info retrieved successfully",
@@ -220,6 +414,18 @@ class GetUserNameView(APIView):
                         "last_name": "Turgunjonov",
                         "email": "nobody@example.com",
                         "profile_image": "http://localhost:8000/media/users/avatar.png",
+                        "profile_image_variants": {
+                            "160": {
+                                "webp": (
+                                    "http://localhost:8000"
+                                    "/media/users/variants/avatar_160.webp"
+                                ),
+                                "jpeg": (
+                                    "http://localhost:8000"
+                                    "/media/users/variants/avatar_160.jpeg"
+                                ),
+                            }
+                        },
                         "date_joined": "2025-11-11T14:30:00Z"
                     }
                 },
@@ -239,7 +445,89 @@ class GetUserNameView(APIView):
                     request.build_absolute_uri(user.profile_image.url)
                     if user.profile_image else None
                 ),
+                "profile_image_variants": variant_urls(user.profile_image, request),
                 "date_joined": user.date_joined,
             },
             status=status.HTTP_200_OK
         )
+
+
+def upload_too_large():
+    limit = AVATAR_MAX_UPLOAD_SIZE // (1024 * 1024)
+    return Response(
+        {"error": f"Profile image must be at most {limit} MB"},
+        status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+    )
+
+
+class ProfileImageView(APIView):
+    """
+    Replace the authenticated user's profile image.
+    """
+    authentication_classes = [CustomUserJWTAuthentication]
+    parser_classes = (MultiPartParser, FormParser)
+
+    @swagger_auto_schema(
+        tags=["Userprofile"],
+        operation_summary="Upload profile image",
+        operation_description=(
+            "Streams the image to disk, rejects oversized or undecodable files "
+            "from the header alone, then stores a square avatar with EXIF and "
+            "other metadata removed. Small WebP/JPEG variants are returned as well."
+        ),
+        request_body=ProfileImageSerializer,
+        responses={
+            200: openapi.Response(
+                description="Profile image updated",
+                examples={
+                    "application/json": {
+                        "profile_image": "http://localhost:8000/media/user/3f2a.jpg",
+                        "profile_image_variants": {
+                            "160": {
+                                "webp": (
+                                    "http://localhost:8000"
+                                    "/media/user/variants/3f2a_160.webp"
+                                ),
+                                "jpeg": (
+                                    "http://localhost:8000"
+                                    "/media/user/variants/3f2a_160.jpeg"
+                                ),
+                            }
+                        },
+                    }
+                },
+            ),
+            400: openapi.Response(description="Not a valid image"),
+            401: openapi.Response(
+                description="Authentication credentials were not provided."
+            ),
+            413: openapi.Response(description="Profile image is too large"),
+        },
+    )
+    def put(self, request, *args, **kwargs):
+        handler = stream_uploads(request)
+        if handler is None:
+            return upload_too_large()
+        serializer = ProfileImageSerializer(data=request.data)
+        if handler.exceeded:
+            return upload_too_large()
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # request.user may be rebuilt from token claims; save the real row.
+        user = UserModel.objects.get(id=request.user.id)
+        previous = user.profile_image.name
+        user.profile_image = serializer.validated_data["profile_image"]
+        with transaction.atomic():
+            user.save(update_fields=["profile_image"])
+            if previous:
+                storage = user.profile_image.storage
+                transaction.on_commit(lambda: delete_avatar(storage, previous))
+
+        return Response(
+            {
+                "profile_image": request.build_absolute_uri(user.profile_image.url),
+                "profile_image_variants": variant_urls(user.profile_image, request),
+            },
+            status=status.HTTP_200_OK,
+        )
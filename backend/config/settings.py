@@ -24,6 +24,26 @@ EMAIL_HOST_PASSWORD = "dhjmuoxeyflgoniu"
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+# Threads hashing passwords for the async login view; defaults to the CPU count.
+PASSWORD_HASHING_WORKERS = int(os.getenv("PASSWORD_HASHING_WORKERS", 0)) or None
+# Profile images are stored as AVATAR_SIZE squares. Uploads are streamed to
+# a temp file and refused past the byte and pixel limits; at most
+# AVATAR_WORKERS uploads are decoded at a time.
+AVATAR_SIZE = 256
+AVATAR_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+AVATAR_MAX_PIXELS = 40_000_000
+AVATAR_WORKERS = 2
+# How often each worker pulls new token revocations (logout, revoke-all)
+# into its in-memory denylist.
+TOKEN_REVOCATION_REFRESH_SECONDS = 5
+# Lifetime and length of email verification codes.
+OTP_TTL = datetime.timedelta(minutes=5)
+OTP_DIGITS = 6
+# Outbox worker (send_outbox): attempts before a message is parked as Dead,
+# and the backoff between attempts (doubling from BASE, capped at MAX).
+EMAIL_OUTBOX_MAX_ATTEMPTS = 6
+EMAIL_OUTBOX_RETRY_BASE = datetime.timedelta(seconds=30)
+EMAIL_OUTBOX_RETRY_MAX = datetime.timedelta(hours=1)
 
 
 # Application definition
@@ -50,7 +70,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'Products.middleware.CatalogSnapshotMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -115,6 +135,7 @@ CORS_ALLOW_HEADERS = [
     "authorizations",
     "content-type",
     "dnt",
+    "idempotency-key",
     "origin",
     "user-agent",
     "x-csrftoken",
@@ -148,15 +169,81 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
+    # Token buckets for the auth endpoints (User.throttling): "<n>/<period>"
+    # is a burst of n that refills at n per period, per client IP or email.
+    "DEFAULT_THROTTLE_RATES": {
+        "otp_ip": "20/h",
+        "otp_email": "3/10m",
+        "verify_ip": "60/h",
+        "verify_email": "5/10m",
+        "login_ip": "30/m",
+        "login_email": "10/10m",
+    },
+    # Reverse proxies in front of gunicorn that append to X-Forwarded-For.
+    # 0 keys client IP throttles on REMOTE_ADDR and ignores the header.
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", 0)),
 }
 
+# Rate limit counters, shared by the workers on this host.
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB", BASE_DIR / ".cache" / "ratelimit.sqlite3")
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # WAL lets readers run alongside the single writer, and BEGIN
+            # IMMEDIATE makes concurrent writers (checkouts) queue for up to
+            # `timeout` seconds instead of failing on a lock upgrade.
+            'init_command': 'PRAGMA journal_mode=WAL;',
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # A file instead of shared in-memory SQLite, so tests can exercise
+        # concurrent requests from several threads.
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Rendered catalog responses, per worker, LRU-evicted past MAX_ENTRIES.
+    "catalog": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "catalog",
+        "TIMEOUT": None,
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", 1000))},
+    },
+    # Authenticated users by id, per worker. Dropped on save/delete in this
+    # worker; TIMEOUT bounds how stale another worker's copy can get.
+    "users": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "users",
+        "TIMEOUT": int(os.getenv("USER_CACHE_TIMEOUT", 60)),
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("USER_CACHE_MAX_ENTRIES", 10000))},
+    },
+    # Catalog version counter, shared by every worker on the host.
+    "catalog_version": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv("CATALOG_VERSION_DIR", BASE_DIR / ".cache" / "catalog_version"),
+        "TIMEOUT": None,
+    },
+    # Current profile version per user id, per worker like "users". Entries
+    # are dropped on profile changes in this worker and re-read from the
+    # database on a miss; TIMEOUT bounds how long another worker keeps
+    # accepting the claims of an older version.
+    "profile_versions": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "profile_versions",
+        "TIMEOUT": int(os.getenv("PROFILE_VERSION_TIMEOUT", 60)),
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("PROFILE_VERSION_MAX_ENTRIES", 50000))},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -203,6 +290,35 @@ STATICFILES_FINDERS = [
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = "/app/media"
+# Widths of the resized WebP/JPEG copies built for uploaded images.
+IMAGE_VARIANT_WIDTHS = (160, 320, 640)
+# Lower bounds of the price facet buckets; the last one is open-ended.
+PRODUCT_PRICE_BUCKETS = (0, 50, 100, 250, 500, 1000)
+# Most product ids one products/batch/ call may ask for.
+PRODUCT_BATCH_MAX_IDS = 100
+
+# Pre-rendered catalog JSON, served by WhiteNoise under CATALOG_SNAPSHOT_URL.
+CATALOG_SNAPSHOT_ROOT = os.getenv("CATALOG_SNAPSHOT_ROOT", BASE_DIR / "snapshots")
+CATALOG_SNAPSHOT_URL = "/snapshots/"
+# Origin the snapshot's image and page links are made absolute against.
+CATALOG_SNAPSHOT_BASE_URL = os.getenv(
+    "CATALOG_SNAPSHOT_BASE_URL", "https://khagan.univibe.uz"
+)
+CATALOG_SNAPSHOT_PAGE_SIZE = 100
+CATALOG_SNAPSHOT_KEEP = 2
+# Rebuild the snapshot in the background after every catalog change.
+CATALOG_SNAPSHOT_ON_CHANGE = os.getenv("CATALOG_SNAPSHOT_ON_CHANGE") == "1"
+
+# How long replies to Idempotency-Key requests are kept for replays.
+IDEMPOTENCY_KEY_TTL = datetime.timedelta(hours=24)
+# A key whose first request has not finished after this long is taken to be
+# abandoned by a dead worker and may be claimed by a retry.
+IDEMPOTENCY_KEY_LEASE = datetime.timedelta(minutes=2)
+# Embed the profile in access tokens issued at login, so profile reads and
+# authentication are served from the token while its profile is current.
+AUTH_PROFILE_CLAIMS = os.getenv("AUTH_PROFILE_CLAIMS") == "1"
+# Active cart lines untouched for this long are removed by purge_stale_carts.
+CART_STALE_AFTER = datetime.timedelta(days=30)
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -3,10 +3,13 @@ from django.db import models
 
 class Advertisement(models.Model):
     image = models.ImageField(upload_to="banners/")
+    # Set by generate_variants (Products.images), read by variant_urls.
+    image_variant_widths = models.JSONField(default=list, blank=True, editable=False)
     title = models.CharField(max_length=255)
     description = models.TextField()
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.title
@@ -1,7 +1,16 @@
 from rest_framework import serializers
 from .models import Advertisement
+from Products.images import variant_urls
 
 class AdvertisementSerializer(serializers.ModelSerializer):
+    image_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Advertisement
-        fields = "__all__"
+        fields = [
+            "id", "image", "title", "description", "created_at", "updated_at",
+            "image_variants",
+        ]
+
+    def get_image_variants(self, obj):
+        return variant_urls(obj.image, self.context.get("request"))
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from Products.conditional import schedule_deletion_record
+from Products.images import generate_variants, image_changed, track_image_changes
+from .models import Advertisement
+
+
+track_image_changes(Advertisement, "image")
+
+
+@receiver(post_save, sender=Advertisement)
+def build_banner_image_variants(sender, instance, raw=False, **kwargs):
+    if raw or not image_changed(instance, "image"):
+        return
+    generate_variants(instance.image)
+
+
+@receiver(post_delete, sender=Advertisement)
+def record_banner_deletion(sender, **kwargs):
+    schedule_deletion_record("reklama.Advertisement")
@@ -1,3 +1,75 @@
-from django.test import TestCase
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from User.models import UserModel
+from .models import Advertisement
+
+
+ADS_URL = "/api/v1/api/v1/ads/"
+
+
+class AdvertisementConditionalGetTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(CACHES={
+            **settings.CACHES,
+            "catalog_version": {
+                **settings.CACHES["catalog_version"],
+                "LOCATION": directory.name,
+            },
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        patcher = mock.patch("reklama.signals.generate_variants", return_value=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        user = UserModel.objects.create(
+            email="ads@example.com", password="Secret-pass1"
+        )
+        refresh = RefreshToken.for_user(user)
+        refresh["id"] = user.id
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+        self.sale = Advertisement.objects.create(
+            image="banners/sale.png", title="Sale", description=""
+        )
+        Advertisement.objects.create(
+            image="banners/new.png", title="New", description=""
+        )
+        self.first = self.client.get(ADS_URL)
+
+    def test_validators_are_sent(self):
+        self.assertEqual(self.first.status_code, 200)
+        self.assertIn("ETag", self.first)
+        self.assertIn("Last-Modified", self.first)
+
+    def test_unchanged_list_is_not_modified(self):
+        response = self.client.get(
+            ADS_URL, HTTP_IF_MODIFIED_SINCE=self.first["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(ADS_URL, HTTP_IF_NONE_MATCH=self.first["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_deletion_moves_last_modified_forward(self):
+        later = time.time_ns() + 10**10
+        with mock.patch("Products.conditional.time.time_ns", return_value=later):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.sale.delete()
+
+        response = self.client.get(
+            ADS_URL, HTTP_IF_MODIFIED_SINCE=self.first["Last-Modified"]
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([ad["title"] for ad in response.data], ["New"])
@@ -4,11 +4,14 @@ from .serializers import AdvertisementSerializer
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from User.authentication import CustomUserJWTAuthentication
+from Products.conditional import ConditionalGetMixin
 
-class AdvertisementListView(generics.ListAPIView):
+
+class AdvertisementListView(ConditionalGetMixin, generics.ListAPIView):
     queryset = Advertisement.objects.all().order_by('-created_at')
     serializer_class = AdvertisementSerializer
     authentication_classes = [CustomUserJWTAuthentication]
+    deletion_label = "reklama.Advertisement"
 
     @swagger_auto_schema(
         operation_summary="Reklamalar ro‘yxatini olish",